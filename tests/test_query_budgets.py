@@ -0,0 +1,14 @@
+from core import query_budget
+
+
+def test_every_view_has_budget():
+    missing = query_budget.missing()
+    assert not missing, (
+        'Задайте бюджет запросов в query_budgets.py приложения для адресов: '
+        + ', '.join(missing)
+    )
+
+
+def test_view_query_budget(view_budget, budget_dataset, client):
+    name, budget = view_budget
+    query_budget.check(name, budget, budget_dataset, client)
@@ -0,0 +1,6 @@
+from core.query_budget import Budget
+
+BUDGETS = {
+    'about:author': Budget(0, login=None),
+    'about:tech': Budget(0, login=None),
+}
@@ -0,0 +1,100 @@
+import json
+from collections import Counter
+
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+
+from core.models import RequestProfile
+
+TOP_FRAMES = 30
+
+DOWNLOADS = {
+    'stacks': ('folded', 'text/plain; charset=utf-8'),
+    'queries': ('sql.json', 'application/json; charset=utf-8'),
+}
+
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created', 'method', 'path', 'view_name', 'mode',
+                    'status_code', 'duration_ms', 'query_count', 'sql_ms',
+                    'user')
+    list_filter = ('mode', 'view_name')
+    list_select_related = ('user',)
+    search_fields = ('path', 'view_name')
+    fields = ('created', 'user', 'method', 'path', 'view_name', 'mode',
+              'status_code', 'duration_ms', 'query_count', 'sql_ms',
+              'downloads', 'hot_frames', 'timeline')
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/<str:field>/',
+                 self.admin_site.admin_view(self.download),
+                 name='core_requestprofile_download'),
+        ] + super().get_urls()
+
+    def download(self, request, pk, field):
+        """Отдаёт стеки или SQL файлом, только тем, кто видит профиль."""
+        if field not in DOWNLOADS:
+            raise Http404
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        extension, content_type = DOWNLOADS[field]
+        response = HttpResponse(getattr(profile, field),
+                                content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="profile-{pk}.{extension}"'
+        )
+        return response
+
+    def downloads(self, profile):
+        return format_html_join(' ', '<a href="{}">{}</a>', (
+            (reverse('admin:core_requestprofile_download',
+                     args=(profile.pk, field)),
+             RequestProfile._meta.get_field(field).verbose_name)
+            for field in DOWNLOADS
+        ))
+    downloads.short_description = 'Скачать'
+
+    def hot_frames(self, profile):
+        """Функции, на которых стек кончается чаще всего."""
+        weights = Counter()
+        total = 0
+        for line in profile.stacks.splitlines():
+            stack, weight = line.rsplit(' ', 1)
+            weights[stack.rsplit(';', 1)[-1]] += int(weight)
+            total += int(weight)
+        return format_html(
+            '<table><tr><th>Доля</th><th>Функция</th></tr>{}</table>',
+            format_html_join('', '<tr><td>{:.1%}</td><td>{}</td></tr>', (
+                (weight / (total or 1), frame)
+                for frame, weight in weights.most_common(TOP_FRAMES)
+            ))
+        )
+    hot_frames.short_description = 'Собственное время'
+
+    def timeline(self, profile):
+        rows = format_html_join(
+            '', '<tr><td>{}</td><td>{}</td><td>{}</td></tr>',
+            ((query['start_ms'], query['duration_ms'], query['sql'])
+             for query in json.loads(profile.queries))
+        )
+        return format_html(
+            '<table><tr><th>Начало, мс</th><th>Длительность, мс</th>'
+            '<th>SQL</th></tr>{}</table>', rows
+        )
+    timeline.short_description = 'SQL по времени'
+
+
+admin.site.register(RequestProfile, RequestProfileAdmin)
@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.core import checks
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from core.checks import ensure_production_ready, production_settings
+        from core.sqlite import apply_pragmas
+
+        checks.register(production_settings)
+        ensure_production_ready()
+        connection_created.connect(apply_pragmas)
@@ -0,0 +1,79 @@
+"""Проверка, что продакшен не запущен с медленными отладочными путями.
+
+CoreConfig.ready() вызывает ensure_production_ready(), так что с такими
+настройками не поднимется ни manage.py, ни WSGI-воркер.
+"""
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+DEBUG_PROCESSOR = 'django.template.context_processors.debug'
+CACHED_LOADER = 'django.template.loaders.cached.Loader'
+DJANGO_TEMPLATES = 'django.template.backends.django.DjangoTemplates'
+MANIFEST_STORAGE = (
+    'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
+)
+DUMMY_CACHE = 'django.core.cache.backends.dummy.DummyCache'
+
+
+def _caches_templates(options):
+    loaders = options.get('loaders')
+    if loaders is None:
+        # Без явных loaders Django кэширует шаблоны только без debug.
+        return not options.get('debug', settings.DEBUG)
+    first = loaders[0]
+    return isinstance(first, (list, tuple)) and first[0] == CACHED_LOADER
+
+
+def _template_errors():
+    errors = []
+    for engine in settings.TEMPLATES:
+        if engine['BACKEND'] != DJANGO_TEMPLATES:
+            continue
+        options = engine.get('OPTIONS', {})
+        if not _caches_templates(options):
+            errors.append(checks.Error(
+                'Шаблоны читаются с диска на каждый ответ',
+                hint=f'Поставьте первым загрузчиком {CACHED_LOADER}',
+                id='yatube.E002'
+            ))
+        if DEBUG_PROCESSOR in options.get('context_processors', ()):
+            errors.append(checks.Error(
+                f'Включён {DEBUG_PROCESSOR}', id='yatube.E003'
+            ))
+    return errors
+
+
+def production_settings(app_configs=None, **kwargs):
+    if settings.YATUBE_ENV != 'production':
+        return []
+    errors = _template_errors()
+    if settings.DEBUG:
+        errors.append(checks.Error('DEBUG включён', id='yatube.E001'))
+    if not settings.DATABASES['default'].get('CONN_MAX_AGE'):
+        errors.append(checks.Error(
+            'Соединение с базой открывается на каждый запрос',
+            hint='Задайте CONN_MAX_AGE', id='yatube.E004'
+        ))
+    storage = import_string(settings.STATICFILES_STORAGE)
+    if not issubclass(storage, import_string(MANIFEST_STORAGE)):
+        errors.append(checks.Error(
+            'Статика без хешей в именах не кэшируется браузером надолго',
+            hint=f'STATICFILES_STORAGE = {MANIFEST_STORAGE!r}',
+            id='yatube.E005'
+        ))
+    for alias, options in settings.CACHES.items():
+        if options['BACKEND'] == DUMMY_CACHE:
+            errors.append(checks.Error(
+                f'Кэш {alias} ничего не хранит', id='yatube.E006'
+            ))
+    return errors
+
+
+def ensure_production_ready():
+    errors = production_settings()
+    if errors:
+        raise ImproperlyConfigured('Продакшен не запущен:\n' + '\n'.join(
+            str(error) for error in errors
+        ))
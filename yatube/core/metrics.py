@@ -0,0 +1,343 @@
+"""Метрики запросов в текстовом формате Prometheus.
+
+MetricsMiddleware для каждого адреса (по имени из resolver_match)
+меряет время ответа, число и время SQL-запросов, время отрисовки
+шаблонов, попадания и промахи кэша и размер ответа. Всё копится в
+гистограммах процесса: на горячем пути это несколько сложений под
+одной блокировкой.
+
+Если задан METRICS_DIR, каждый воркер не чаще раза в
+METRICS_FLUSH_INTERVAL секунд сбрасывает туда свой снимок, а /metrics
+складывает снимки всех воркеров. Снимки завершившихся процессов
+collect() удаляет, чтобы каталог не рос с каждым перезапуском
+воркеров; суммы счётчиков от этого уменьшаются, и Prometheus видит
+обычный сброс счётчика.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection
+from django.template.backends.django import Template
+from django.utils.module_loading import import_string
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                    5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+
+# Имя: (описание, границы корзин).
+HISTOGRAMS = {
+    'yatube_request_duration_seconds': ('Время ответа', DURATION_BUCKETS),
+    'yatube_sql_queries': ('SQL-запросов на ответ', QUERY_BUCKETS),
+    'yatube_sql_duration_seconds': ('Время SQL на ответ', DURATION_BUCKETS),
+    'yatube_template_render_seconds': ('Время отрисовки шаблонов',
+                                       DURATION_BUCKETS),
+    'yatube_response_size_bytes': ('Размер ответа', SIZE_BUCKETS),
+}
+
+COUNTERS = {
+    'yatube_responses_total': 'Ответы по кодам',
+    'yatube_cache_hits_total': 'Попадания в кэш',
+    'yatube_cache_misses_total': 'Промахи кэша',
+}
+
+UNRESOLVED = '<unresolved>'
+
+_local = threading.local()
+_missing = object()
+
+
+class Recorder:
+    """Что набрал один запрос; заодно execute_wrapper для SQL."""
+
+    __slots__ = ('queries', 'sql_time', 'template_time', 'hits', 'misses',
+                 'rendering', 'in_cache')
+
+    def __init__(self):
+        self.queries = self.hits = self.misses = 0
+        self.sql_time = self.template_time = 0.0
+        self.rendering = self.in_cache = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - started
+
+
+class Registry:
+    """Гистограммы и счётчики одного процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        # Имя снимка не только по pid: pid может достаться новому
+        # процессу, и тот затёр бы снимок старого.
+        self.file_name = f'{self.pid}-{uuid.uuid4().hex[:8]}.json'
+        # (имя, метки): счётчики по корзинам, последняя - +Inf, и сумма.
+        self.histograms = {}
+        self.counters = {}
+        self.flushed = time.monotonic()
+
+    def record(self, view, status, recorder, duration, size):
+        labels = (('view', view),)
+        observations = [
+            ('yatube_request_duration_seconds', duration),
+            ('yatube_sql_queries', recorder.queries),
+            ('yatube_sql_duration_seconds', recorder.sql_time),
+            ('yatube_template_render_seconds', recorder.template_time),
+        ]
+        if size is not None:
+            observations.append(('yatube_response_size_bytes', size))
+        with self._lock:
+            if self.pid != os.getpid():
+                # После fork данные родителя не наши.
+                self.reset()
+            for name, value in observations:
+                buckets = HISTOGRAMS[name][1]
+                series = self.histograms.get((name, labels))
+                if series is None:
+                    series = [0] * (len(buckets) + 1) + [0.0]
+                    self.histograms[(name, labels)] = series
+                series[bisect.bisect_left(buckets, value)] += 1
+                series[-1] += value
+            for name, key, amount in (
+                ('yatube_responses_total',
+                 labels + (('status', str(status)),), 1),
+                ('yatube_cache_hits_total', labels, recorder.hits),
+                ('yatube_cache_misses_total', labels, recorder.misses),
+            ):
+                self.counters[(name, key)] = (
+                    self.counters.get((name, key), 0) + amount
+                )
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'histograms': [[name, dict(labels), list(series)]
+                               for (name, labels), series
+                               in self.histograms.items()],
+                'counters': [[name, dict(labels), value]
+                             for (name, labels), value
+                             in self.counters.items()],
+            }
+
+    def maybe_flush(self):
+        directory = settings.METRICS_DIR
+        if (directory and time.monotonic() - self.flushed
+                >= settings.METRICS_FLUSH_INTERVAL):
+            self.flush(directory)
+
+    def flush(self, directory):
+        self.flushed = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.file_name)
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as target:
+            json.dump(self.snapshot(), target)
+        os.replace(temporary, path)
+
+
+registry = Registry()
+
+
+def merge(snapshots):
+    """Складывает снимки воркеров в два словаря по (имя, метки)."""
+    histograms, counters = {}, {}
+    for snapshot in snapshots:
+        for name, labels, series in snapshot['histograms']:
+            key = (name, tuple(sorted(labels.items())))
+            total = histograms.get(key)
+            histograms[key] = (series if total is None else
+                               [a + b for a, b in zip(total, series)])
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(sorted(labels.items())))
+            counters[key] = counters.get(key, 0) + value
+    return histograms, counters
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Процесс есть, просто чужой.
+        pass
+    return True
+
+
+def collect():
+    """Снимок этого процесса вместе со снимками остальных воркеров."""
+    snapshots = [registry.snapshot()]
+    directory = settings.METRICS_DIR
+    if directory and os.path.isdir(directory):
+        for name in os.listdir(directory):
+            pid = name.split('-', 1)[0]
+            if pid.isdigit() and not _alive(int(pid)):
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+                continue
+            if not name.endswith('.json') or name == registry.file_name:
+                continue
+            try:
+                with open(os.path.join(directory, name),
+                          encoding='utf-8') as source:
+                    snapshots.append(json.load(source))
+            except (OSError, ValueError):
+                continue
+    return merge(snapshots)
+
+
+def _escape(value):
+    return (value.replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'))
+
+
+def _labels(labels, *extra):
+    pairs = [f'{key}="{_escape(value)}"' for key, value in labels + extra]
+    return '{' + ','.join(pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(histograms, counters):
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for (series_name, labels), series in sorted(histograms.items()):
+            if series_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), series):
+                cumulative += count
+                le = bound if bound == '+Inf' else _number(bound)
+                lines.append(f'{name}_bucket'
+                             f'{_labels(labels, ("le", le))} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} '
+                         f'{_number(series[-1])}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    for name, help_text in COUNTERS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (series_name, labels), value in sorted(counters.items()):
+            if series_name == name:
+                lines.append(f'{name}{_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+# Обёртки шаблонов и кэша. Вне запроса они только проверяют, что
+# записывать некуда; вложенные вызовы считаются один раз.
+
+def _timed_render(render_template):
+    @wraps(render_template)
+    def wrapper(self, context=None, request=None):
+        recorder = getattr(_local, 'recorder', None)
+        if recorder is None or recorder.rendering:
+            return render_template(self, context, request)
+        recorder.rendering = True
+        started = time.perf_counter()
+        try:
+            return render_template(self, context, request)
+        finally:
+            recorder.rendering = False
+            recorder.template_time += time.perf_counter() - started
+    return wrapper
+
+
+def _counted_get(get):
+    @wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        recorder = getattr(_local, 'recorder', None)
+        if recorder is None or recorder.in_cache:
+            return get(self, key, default, version)
+        recorder.in_cache = True
+        try:
+            value = get(self, key, _missing, version)
+        finally:
+            recorder.in_cache = False
+        if value is _missing:
+            recorder.misses += 1
+            return default
+        recorder.hits += 1
+        return value
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    @wraps(get_many)
+    def wrapper(self, keys, version=None):
+        recorder = getattr(_local, 'recorder', None)
+        if recorder is None or recorder.in_cache:
+            return get_many(self, keys, version)
+        keys = list(keys)
+        recorder.in_cache = True
+        try:
+            found = get_many(self, keys, version)
+        finally:
+            recorder.in_cache = False
+        recorder.hits += len(found)
+        recorder.misses += len(keys) - len(found)
+        return found
+    return wrapper
+
+
+_installed = False
+
+
+def install():
+    """Ставит обёртки на шаблоны Django и бэкенды из CACHES."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    Template.render = _timed_render(Template.render)
+    for backend in {import_string(options['BACKEND'])
+                    for options in settings.CACHES.values()}:
+        backend.get = _counted_get(backend.get)
+        backend.get_many = _counted_get_many(backend.get_many)
+
+
+class MetricsMiddleware:
+    """Должна стоять первой, чтобы время ответа было полным.
+
+    У потоковых ответов меряется время до заголовков, а размер не
+    пишется вовсе.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install()
+
+    def __call__(self, request):
+        recorder = Recorder()
+        _local.recorder = recorder
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+        finally:
+            _local.recorder = None
+        duration = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        size = None if response.streaming else len(response.content)
+        registry.record(match.view_name if match else UNRESOLVED,
+                        response.status_code, recorder, duration, size)
+        registry.maybe_flush()
+        return response
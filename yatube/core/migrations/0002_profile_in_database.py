@@ -0,0 +1,67 @@
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def move_to_database(apps, schema_editor):
+    """Переносит файлы профилей из MEDIA_ROOT в базу и удаляет их."""
+    RequestProfile = apps.get_model('core', 'RequestProfile')
+    for profile in RequestProfile.objects.iterator():
+        for source, target in (('stacks', 'stacks_text'),
+                               ('queries', 'queries_text')):
+            name = getattr(profile, source).name
+            if name and default_storage.exists(name):
+                with default_storage.open(name, 'rb') as data:
+                    setattr(profile, target, data.read().decode())
+                default_storage.delete(name)
+        profile.save(update_fields=('stacks_text', 'queries_text'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='requestprofile',
+            name='stacks_text',
+            field=models.TextField(default=''),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='requestprofile',
+            name='queries_text',
+            field=models.TextField(default=''),
+            preserve_default=False,
+        ),
+        migrations.RunPython(move_to_database, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='requestprofile',
+            name='stacks',
+        ),
+        migrations.RemoveField(
+            model_name='requestprofile',
+            name='queries',
+        ),
+        migrations.RenameField(
+            model_name='requestprofile',
+            old_name='stacks_text',
+            new_name='stacks',
+        ),
+        migrations.RenameField(
+            model_name='requestprofile',
+            old_name='queries_text',
+            new_name='queries',
+        ),
+        migrations.AlterField(
+            model_name='requestprofile',
+            name='stacks',
+            field=models.TextField(help_text='Открывается в speedscope или flamegraph.pl', verbose_name='Стеки (collapsed)'),
+        ),
+        migrations.AlterField(
+            model_name='requestprofile',
+            name='queries',
+            field=models.TextField(verbose_name='SQL-запросы по времени (JSON)'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.db import models
+
+User = get_user_model()
+
+
+class RequestProfile(models.Model):
+    """Профиль одного запроса, снятый core.profiling."""
+    MODE_CHOICES = (
+        ('sample', 'Выборка стеков'),
+        ('trace', 'Все вызовы'),
+    )
+
+    created = models.DateTimeField(
+        'Снят',
+        auto_now_add=True,
+        db_index=True
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        verbose_name='Кто снял'
+    )
+    method = models.CharField('Метод', max_length=10)
+    path = models.CharField('Адрес', max_length=2000)
+    view_name = models.CharField('Имя адреса', max_length=200,
+                                 blank=True)
+    mode = models.CharField('Режим', max_length=10, choices=MODE_CHOICES)
+    status_code = models.PositiveSmallIntegerField('Код ответа')
+    duration_ms = models.FloatField('Время ответа, мс')
+    query_count = models.PositiveIntegerField('SQL-запросов')
+    sql_ms = models.FloatField('Время SQL, мс')
+    # Хранятся в базе, а не в MEDIA_ROOT: в SQL бывают личные данные,
+    # и отдавать их можно только через админку.
+    stacks = models.TextField(
+        'Стеки (collapsed)',
+        help_text='Открывается в speedscope или flamegraph.pl'
+    )
+    queries = models.TextField('SQL-запросы по времени (JSON)')
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+
+    def __str__(self):
+        return f'{self.method} {self.path}'
@@ -0,0 +1,162 @@
+import hashlib
+import re
+import time
+import uuid
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+
+FRAGMENT_MARKER = '<!--per-request:{}-->'
+FRAGMENT_RE = re.compile(r'<!--per-request:([\w./-]+)-->')
+VERSION_RE = re.compile(r'^(\d+\.\d+)-')
+
+
+def is_shared_render(request):
+    return getattr(request, '_shared_cache_render', False)
+
+
+def tag_key(tag):
+    return f'page_tag:{tag}'
+
+
+def add_tags(request, *tags):
+    """Отмечает, от каких тегов зависит страница, которая сейчас рисуется.
+
+    Версии тегов запоминаются сразу, поэтому звать надо до чтения
+    данных: тогда сброс посреди отрисовки оставит страницу устаревшей.
+    """
+    page_tags = getattr(request, '_cache_tags', None)
+    if page_tags is not None:
+        new = [tag for tag in tags if tag_key(tag) not in page_tags]
+        if new:
+            page_tags.update(tag_versions(*new))
+
+
+def _new_version():
+    # Время смены версии тега служит ещё и для Last-Modified.
+    return f'{time.time():.6f}-{uuid.uuid4().hex[:8]}'
+
+
+def version_time(version):
+    match = VERSION_RE.match(version)
+    return float(match.group(1)) if match else None
+
+
+def purge(*tags):
+    """Делает устаревшими все страницы, записанные с этими тегами."""
+    cache.set_many({tag_key(tag): _new_version() for tag in tags}, None)
+
+
+def tag_versions(*tags):
+    keys = {tag_key(tag) for tag in tags}
+    versions = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys - versions.keys()}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return versions
+
+
+def viewer_key(request, csrf=False):
+    """Всё, от чего зависят пользовательские куски страницы.
+
+    Для страниц с формами в ключ входит и CSRF-cookie: get_token()
+    заводит её заранее, так что 304 не оставит браузеру чужой токен.
+    """
+    key = (request.user.pk, request.user.get_username())
+    if csrf:
+        get_token(request)
+        key += (request.META['CSRF_COOKIE'],)
+    return key
+
+
+def validators(versions, *parts):
+    """ETag и время Last-Modified по версиям тегов и прочим данным."""
+    raw = repr((sorted(versions.items()), parts)).encode()
+    times = [version_time(version) for version in versions.values()]
+    return (quote_etag(hashlib.md5(raw).hexdigest()),
+            max(filter(None, times), default=None))
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Страница своя у каждого, но браузер обязан сверять её с сервером.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _is_fresh(versions):
+    return not versions or cache.get_many(versions.keys()) == versions
+
+
+def _cache_key(key_prefix, request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'shared_page:{key_prefix}:{path}'
+
+
+def _fill_fragments(body, request, context):
+    def render(match):
+        return render_to_string(match.group(1), context, request)
+    return FRAGMENT_RE.sub(render, body)
+
+
+def shared_cache_page(timeout, key_prefix='', fragment_context=None):
+    """Кэширует одну общую для всех страницу на каждый URL.
+
+    Пользовательские куски, выведенные тегом {% per_request %}, в
+    кэш не попадают и дорисовываются на каждый запрос, контекст для
+    них даёт fragment_context(request, **kwargs). Страница хранится
+    вместе с версиями тегов, снятыми в add_tags(), и считается
+    устаревшей, как только любой из этих тегов сброшен через purge().
+
+    По тем же версиям тегов строятся ETag и Last-Modified, так что
+    на повторный запрос с If-None-Match или If-Modified-Since ответ
+    304 уходит до отрисовки пользовательских кусков.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            key = _cache_key(key_prefix, request)
+            cached = cache.get(key)
+            if cached is None or not _is_fresh(cached[2]):
+                request._shared_cache_render = True
+                request._cache_tags = {}
+                try:
+                    response = view(request, *args, **kwargs)
+                finally:
+                    request._shared_cache_render = False
+                if response.status_code != 200 or response.streaming:
+                    return response
+                cached = (
+                    response.content.decode(response.charset),
+                    response['Content-Type'],
+                    request._cache_tags,
+                )
+                if not response.cookies:
+                    cache.set(key, cached, timeout)
+            body, content_type, versions = cached
+            etag, last_modified = validators(versions, viewer_key(request))
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                context = (fragment_context(request, **kwargs)
+                           if fragment_context else {})
+                response = HttpResponse(
+                    _fill_fragments(body, request, context),
+                    content_type=content_type
+                )
+            patch_vary_headers(response, ('Cookie',))
+            return set_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
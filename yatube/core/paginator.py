@@ -0,0 +1,163 @@
+import base64
+import binascii
+
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+# Ниже этой оценки число строк дешевле посчитать точно.
+EXACT_COUNT_BELOW = 10000
+
+
+def encode_cursor(date, pk):
+    raw = f'{date.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        date, pk = raw.decode().split('|')
+        date = parse_datetime(date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if date is None:
+        return None
+    return date, pk
+
+
+class KeysetPaginator(Paginator):
+    """Постраничный вывод по ключу (дата, id) без COUNT и OFFSET.
+
+    Страницы адресуются непрозрачными курсорами ?after=/?before=,
+    старые ссылки ?page=N обслуживаются обычным Paginator.
+    """
+
+    def __init__(self, object_list, per_page, date_field='pub_date',
+                 count=None):
+        self.date_field = date_field
+        super().__init__(
+            object_list.order_by(f'-{date_field}', '-pk'), per_page
+        )
+        if count is not None:
+            # Готовый счётчик избавляет ?page=N от отдельного COUNT(*).
+            self.count = count
+
+    def get_page(self, number=None, after=None, before=None):
+        after = decode_cursor(after)
+        before = decode_cursor(before)
+        if after is not None:
+            return self._keyset_page(after, reverse=False)
+        if before is not None:
+            return self._keyset_page(before, reverse=True)
+        if number is not None:
+            page = self._offset_page(number)
+            return self._with_cursors(page, page.has_previous())
+        return self._keyset_page(None, reverse=False)
+
+    def page(self, number):
+        # Срез не обрезается по count: переданный счётчик может отставать.
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        object_list = self.object_list[bottom:bottom + self.per_page]
+        return self._get_page(object_list, number, self)
+
+    def _offset_page(self, number):
+        try:
+            return self.page(number)
+        except PageNotAnInteger:
+            return self.page(1)
+        except EmptyPage:
+            pass
+        # Номер страницы вышел за счётчик: пересчитываем по таблице.
+        self.__dict__.pop('count', None)
+        self.__dict__.pop('num_pages', None)
+        return super().get_page(number)
+
+    def _keyset_page(self, cursor, reverse):
+        date_field = self.date_field
+        object_list = self.object_list
+        if reverse:
+            date, pk = cursor
+            object_list = object_list.filter(
+                Q(**{f'{date_field}__gt': date})
+                | Q(**{date_field: date, 'pk__gt': pk})
+            ).order_by(date_field, 'pk')
+        elif cursor is not None:
+            date, pk = cursor
+            object_list = object_list.filter(
+                Q(**{f'{date_field}__lt': date})
+                | Q(**{date_field: date, 'pk__lt': pk})
+            )
+        rows = list(object_list[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+            has_previous, has_next = has_more, True
+        else:
+            has_previous, has_next = cursor is not None, has_more
+        number = 2 if has_previous else 1
+        # Общее число страниц неизвестно: достаточно, чтобы has_next()
+        # и has_previous() у стандартного Page давали верный ответ.
+        self.num_pages = number + 1 if has_next else number
+        page = self._get_page(rows, number, self)
+        return self._with_cursors(page, has_previous)
+
+    def _with_cursors(self, page, has_previous):
+        page.next_cursor = page.previous_cursor = None
+        rows = page.object_list = list(page.object_list)
+        if rows and page.has_next():
+            page.next_cursor = self._cursor(rows[-1])
+        if rows and has_previous:
+            page.previous_cursor = self._cursor(rows[0])
+        return page
+
+    def _cursor(self, obj):
+        return encode_cursor(getattr(obj, self.date_field), obj.pk)
+
+
+def estimate_count(model, using='default'):
+    """Быстрая оценка числа строк таблицы или None, если её не получить.
+
+    На SQLite это разница крайних rowid (поиск по B-дереву, а не обход
+    таблицы), на PostgreSQL - статистика планировщика.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                f'SELECT max(rowid) - min(rowid) + 1 FROM {table}'
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass',
+                [model._meta.db_table]
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator для больших таблиц: без фильтров берёт оценку числа строк.
+
+    Отфильтрованные выборки, как и маленькие таблицы, считаются точно.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= EXACT_COUNT_BELOW:
+                return estimate
+        return super().count
@@ -0,0 +1,194 @@
+"""Профилирование отдельного запроса по просьбе персонала.
+
+Запрос с параметром ?_profile=sample или заголовком X-Profile: sample
+выполняется под профилировщиком, если его прислал сотрудник:
+
+* sample - раз в SAMPLE_INTERVAL секунд снимает стек потока запроса,
+  почти не замедляя его;
+* trace - sys.setprofile видит каждый вызов, зато заметно медленнее.
+
+Стеки сохраняются в формате collapsed (flamegraph.pl, speedscope),
+рядом - SQL-запросы с их параметрами и временем от начала запроса;
+всё это лежит в базе как RequestProfile и открывается только в
+админке. Без параметра и заголовка middleware
+делает одну проверку словаря.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.db import connection
+
+PARAM = '_profile'
+HEADER = 'HTTP_X_PROFILE'
+MODES = ('sample', 'trace')
+
+SAMPLE_INTERVAL = 0.002
+
+_prefixes = sorted((os.path.join(path, '') for path in sys.path if path),
+                   key=len, reverse=True)
+
+
+def frame_name(code):
+    path = code.co_filename
+    for prefix in _prefixes:
+        if path.startswith(prefix):
+            path = path[len(prefix):]
+            break
+    return f'{code.co_name} ({path}:{code.co_firstlineno})'
+
+
+class SamplingProfiler:
+    """Снимает стек одного потока из соседнего потока."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            names = []
+            while frame is not None:
+                names.append(frame_name(frame.f_code))
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+
+class TracingProfiler:
+    """Точное время каждого стека в микросекундах через sys.setprofile."""
+
+    def __init__(self):
+        self.stacks = Counter()
+
+    def start(self):
+        self._keys = []
+        self._last = time.perf_counter()
+        sys.setprofile(self._event)
+
+    def stop(self):
+        sys.setprofile(None)
+        self.stacks = Counter({key: round(seconds * 1_000_000)
+                               for key, seconds in self.stacks.items()})
+
+    def _event(self, frame, event, arg):
+        now = time.perf_counter()
+        keys = self._keys
+        if keys:
+            self.stacks[keys[-1]] += now - self._last
+        if event == 'call':
+            name = frame_name(frame.f_code)
+        elif event == 'c_call':
+            name = f'{getattr(arg, "__qualname__", arg)} (builtin)'
+        else:
+            if keys:
+                keys.pop()
+            self._last = time.perf_counter()
+            return
+        keys.append(f'{keys[-1]};{name}' if keys else name)
+        self._last = time.perf_counter()
+
+
+class QueryTimeline:
+    """execute_wrapper: каждый запрос с началом и длительностью в мс."""
+
+    def __init__(self, started):
+        self.started = started
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'start_ms': round((started - self.started) * 1000, 3),
+                'duration_ms': round(
+                    (time.perf_counter() - started) * 1000, 3
+                ),
+                'sql': sql,
+                'params': None if many else [str(value)
+                                             for value in params or ()],
+            })
+
+
+def requested_mode(request):
+    mode = request.META.get(HEADER)
+    # request.GET разбирается только если параметр вообще есть.
+    if mode is None and PARAM in request.META.get('QUERY_STRING', ''):
+        mode = request.GET.get(PARAM)
+    if mode is None:
+        return None
+    return mode if mode in MODES else MODES[0]
+
+
+def collapsed(stacks):
+    return ''.join(f'{stack} {weight}\n'
+                   for stack, weight in stacks.most_common() if weight)
+
+
+def save(request, response, mode, stacks, timeline, duration):
+    from core.models import RequestProfile
+
+    match = getattr(request, 'resolver_match', None)
+    profile = RequestProfile(
+        user=request.user,
+        method=request.method,
+        path=request.get_full_path()[:2000],
+        view_name=match.view_name if match else '',
+        mode=mode,
+        status_code=response.status_code,
+        duration_ms=round(duration * 1000, 3),
+        query_count=len(timeline.queries),
+        sql_ms=round(sum(query['duration_ms']
+                         for query in timeline.queries), 3),
+        stacks=collapsed(stacks),
+        queries=json.dumps(timeline.queries, ensure_ascii=False, indent=1),
+    )
+    profile.save()
+    return profile
+
+
+class ProfilerMiddleware:
+    """Ставится после AuthenticationMiddleware: нужен request.user.
+
+    У потоковых ответов профилируется всё до отдачи заголовков.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = requested_mode(request)
+        if mode is None or not request.user.is_staff:
+            return self.get_response(request)
+        profiler = SamplingProfiler() if mode == 'sample' else (
+            TracingProfiler()
+        )
+        started = time.perf_counter()
+        timeline = QueryTimeline(started)
+        with connection.execute_wrapper(timeline):
+            profiler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.stop()
+        duration = time.perf_counter() - started
+        profile = save(request, response, mode, profiler.stacks, timeline,
+                       duration)
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
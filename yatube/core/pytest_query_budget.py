@@ -0,0 +1,21 @@
+"""Плагин pytest для бюджетов SQL-запросов из core.query_budget.
+
+Любой тест с аргументом view_budget запускается по разу на каждый
+адрес из реестра бюджетов, а фикстура budget_dataset заводит для него
+данные в тестовой базе.
+"""
+import pytest
+
+from core import query_budget
+
+
+def pytest_generate_tests(metafunc):
+    if 'view_budget' in metafunc.fixturenames:
+        budgets = sorted(query_budget.registry().items())
+        metafunc.parametrize('view_budget', budgets,
+                             ids=[name for name, _ in budgets])
+
+
+@pytest.fixture
+def budget_dataset(db):
+    return query_budget.Dataset()
@@ -0,0 +1,191 @@
+"""Бюджеты SQL-запросов для именованных адресов.
+
+Каждое приложение описывает свои бюджеты в модуле query_budgets.py:
+
+    BUDGETS = {
+        'posts:index': Budget(6),
+        'posts:post_edit': Budget(8, login='author'),
+        'posts:search?q': Budget(5, view='posts:search', data={'q': 'пост'}),
+    }
+
+Ключ - имя адреса или, если у адреса несколько случаев, любая метка
+вместе с view. Если адресу нужны свои данные, setup называет метод
+Dataset, который заводит их перед каждым открытием.
+
+check() открывает адрес на маленьком наборе данных, потом на наборе
+больше страницы, каждый раз с пустым кэшем. Число запросов не должно
+превышать queries ни там, ни там, а прирост между ними - growth, так
+что N+1 виден, даже если в бюджет он пока укладывается.
+"""
+from importlib import import_module
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils.module_loading import module_has_submodule
+
+NAMESPACES = ('posts', 'users', 'about')
+
+# Откуда брать аргументы адреса, если бюджет не говорит иного.
+DEFAULT_KWARGS = {
+    'post_id': 'post.pk',
+    'slug': 'group.slug',
+    'username': 'author.username',
+}
+
+
+class Budget:
+    def __init__(self, queries, growth=0, kwargs=None, login='reader',
+                 method='get', data=None, view=None, setup=None):
+        self.queries = queries
+        self.growth = growth
+        self.kwargs = {**DEFAULT_KWARGS, **(kwargs or {})}
+        self.login = login
+        self.method = method
+        self.data = data or {}
+        self.view = view
+        self.setup = setup
+
+
+class BudgetExceeded(AssertionError):
+    pass
+
+
+def registry():
+    """Все бюджеты из модулей query_budgets установленных приложений."""
+    budgets = {}
+    for app_config in apps.get_app_configs():
+        if module_has_submodule(app_config.module, 'query_budgets'):
+            module = import_module(f'{app_config.name}.query_budgets')
+            budgets.update(module.BUDGETS)
+    return budgets
+
+
+def named_views(namespaces=NAMESPACES):
+    names = []
+    for resolver in get_resolver().url_patterns:
+        if (isinstance(resolver, URLResolver)
+                and resolver.namespace in namespaces):
+            names.extend(f'{resolver.namespace}:{pattern.name}'
+                         for pattern in resolver.url_patterns
+                         if pattern.name)
+    return names
+
+
+def missing():
+    """Именованные адреса, для которых бюджет не задан."""
+    covered = {budget.view or name for name, budget in registry().items()}
+    return [name for name in named_views() if name not in covered]
+
+
+class Dataset:
+    """Данные, на которых рисуются адреса: сначала по одному объекту."""
+
+    def __init__(self):
+        from posts.models import Comment, Follow, Group, Post
+
+        User = get_user_model()
+        self.author = User.objects.create_user(
+            username='budget_author', first_name='Лев', last_name='Толстой'
+        )
+        self.reader = User.objects.create_user(username='budget_reader')
+        self.group = Group.objects.create(title='Группа', slug='budget',
+                                          description='Описание')
+        self.post = Post.objects.create(author=self.author,
+                                        group=self.group, text='Пост')
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def add_spare_post(self):
+        """Отдельный пост для адресов, которые его удаляют."""
+        from posts.models import Post
+
+        self.spare_post = Post.objects.create(author=self.reader,
+                                              text='Лишний')
+
+    def grow(self):
+        """Дорастает до нескольких страниц постов, комментариев и
+        подписчиков, все от разных людей."""
+        from posts.models import Comment, Follow, Post
+
+        User = get_user_model()
+        size = 2 * max(settings.QUANTITY_POST, settings.QUANTITY_COMMENT)
+        people = [User.objects.create_user(username=f'budget_user_{i}')
+                  for i in range(size)]
+        for person in people:
+            Post.objects.create(author=person, group=self.group,
+                                text='Ещё пост')
+            Post.objects.create(author=self.author, group=self.group,
+                                text='Пост автора')
+            Comment.objects.create(post=self.post, author=person,
+                                   text='Ещё комментарий')
+            Follow.objects.create(user=self.reader, author=person)
+            Follow.objects.create(user=person, author=self.author)
+
+    def resolve(self, path):
+        value = self
+        for attr in path.split('.'):
+            value = getattr(value, attr)
+        return value
+
+
+def run(name, budget, dataset, client):
+    """Открывает адрес с пустым кэшем и возвращает выполненные запросы."""
+    view = budget.view or name
+    if budget.setup:
+        getattr(dataset, budget.setup)()
+    url = reverse(view, kwargs={
+        key: dataset.resolve(budget.kwargs[key]) for key in _url_kwargs(view)
+    })
+    client.logout()
+    if budget.login:
+        client.force_login(dataset.resolve(budget.login))
+    cache.clear()
+    with CaptureQueriesContext(connection) as queries:
+        response = getattr(client, budget.method)(url, budget.data)
+        if response.streaming:
+            b''.join(response.streaming_content)
+    return url, [query['sql'] for query in queries.captured_queries]
+
+
+def _url_kwargs(name):
+    namespace, view_name = name.split(':')
+    for resolver in get_resolver().url_patterns:
+        if (isinstance(resolver, URLResolver)
+                and resolver.namespace == namespace):
+            for pattern in resolver.url_patterns:
+                if pattern.name == view_name:
+                    return pattern.pattern.converters
+    raise KeyError(name)
+
+
+def _report(name, url, queries):
+    lines = [f'{index}. {sql}' for index, sql in enumerate(queries, 1)]
+    return f'{name} ({url}): {len(queries)} запросов\n' + '\n'.join(lines)
+
+
+def check(name, budget, dataset, client):
+    """Бросает BudgetExceeded с текстом запросов, если бюджет превышен."""
+    small_url, small = run(name, budget, dataset, client)
+    dataset.grow()
+    large_url, large = run(name, budget, dataset, client)
+    problems = []
+    if max(len(small), len(large)) > budget.queries:
+        problems.append(f'бюджет {budget.queries} запросов превышен')
+    if len(large) - len(small) > budget.growth:
+        problems.append(
+            f'с ростом данных запросов стало больше на '
+            f'{len(large) - len(small)}, можно на {budget.growth}'
+        )
+    if problems:
+        raise BudgetExceeded('\n'.join((
+            f'{name}: ' + '; '.join(problems),
+            _report(name, small_url, small),
+            _report(name, large_url, large),
+        )))
+    return len(small), len(large)
@@ -0,0 +1,331 @@
+"""Кэш в общей памяти для всех процессов-воркеров на одной машине.
+
+Записи лежат в файле, отображённом в память (mmap, MAP_SHARED), поэтому
+каждый воркер gunicorn видит один и тот же тёплый кэш. Файл состоит из
+заголовка, открытой хеш-таблицы слотов и кучи с самими записями.
+Доступ сериализуется блокировкой файла между процессами и обычной
+блокировкой между потоками, так что get/set/incr атомарны.
+
+Когда куча или таблица заполняются, кэш уплотняется: протухшие записи
+выбрасываются, а живые сохраняются по убыванию времени последнего
+обращения, пока не займут три четверти кучи (LRU).
+
+Пример настройки::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.shm_cache.SharedMemoryCache',
+            'LOCATION': '/dev/shm/yatube-cache',
+            'OPTIONS': {'MAX_BYTES': 64 * 1024 * 1024,
+                        'MAX_ENTRIES': 50000},
+        }
+    }
+"""
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.files import locks
+
+MAGIC = b'YTBSHM01'
+HEADER = struct.Struct('<8sIIQQQQQ')
+SLOT = struct.Struct('<16sQIIdQ')
+RECORD = struct.Struct('<II')
+
+EMPTY, USED, DELETED = 0, 1, 2
+MAX_LOAD = 0.7
+KEEP_RATIO = 0.75
+
+
+class SharedMemoryCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = os.path.abspath(location)
+        self._heap_size = int(options.get('MAX_BYTES', 16 * 1024 * 1024))
+        self._slot_count = max(64, self._max_entries * 2)
+        self._heap_start = HEADER.size + SLOT.size * self._slot_count
+        self._size = self._heap_start + self._heap_size
+        self._pid = None
+        self._fd = None
+        self._map = None
+        self._thread_lock = None
+
+    # Служебное: файл, отображение и блокировки.
+
+    def _open(self):
+        if self._pid == os.getpid():
+            return
+        # После fork нельзя пользоваться чужим дескриптором: flock на нём
+        # общий с родителем и не разделял бы процессы.
+        self._pid = os.getpid()
+        self._thread_lock = threading.Lock()
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        self._fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+        locks.lock(self._fd, locks.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size != self._size:
+                os.ftruncate(self._fd, self._size)
+            self._map = mmap.mmap(self._fd, self._size)
+            if not self._header_matches():
+                self._reset()
+        finally:
+            locks.unlock(self._fd)
+
+    @contextmanager
+    def _locked(self):
+        self._open()
+        with self._thread_lock:
+            locks.lock(self._fd, locks.LOCK_EX)
+            try:
+                if not self._header_matches():
+                    self._reset()
+                yield
+            finally:
+                locks.unlock(self._fd)
+
+    def _header_matches(self):
+        magic, slot_count, _, heap_size, *_ = HEADER.unpack_from(self._map)
+        return (magic == MAGIC and slot_count == self._slot_count
+                and heap_size == self._heap_size)
+
+    def _reset(self):
+        self._map[:self._heap_start] = bytes(self._heap_start)
+        self._write_header(heap_top=0, tick=0, used=0, entries=0,
+                           deleted=0)
+
+    def _header(self):
+        (_, _, deleted, _, heap_top, tick, used,
+         entries) = HEADER.unpack_from(self._map)
+        return {'heap_top': heap_top, 'tick': tick, 'used': used,
+                'entries': entries, 'deleted': deleted}
+
+    def _write_header(self, heap_top, tick, used, entries, deleted):
+        HEADER.pack_into(self._map, 0, MAGIC, self._slot_count, deleted,
+                         self._heap_size, heap_top, tick, used, entries)
+
+    # Служебное: слоты и записи.
+
+    def _slot_offset(self, index):
+        return HEADER.size + index * SLOT.size
+
+    def _read_slot(self, index):
+        return SLOT.unpack_from(self._map, self._slot_offset(index))
+
+    def _write_slot(self, index, *slot):
+        SLOT.pack_into(self._map, self._slot_offset(index), *slot)
+
+    def _read_record(self, offset):
+        start = self._heap_start + offset
+        key_length, value_length = RECORD.unpack_from(self._map, start)
+        start += RECORD.size
+        key = self._map[start:start + key_length]
+        value = self._map[start + key_length:
+                          start + key_length + value_length]
+        return key, value
+
+    def _find(self, key):
+        """Возвращает (индекс найденного слота, индекс для вставки)."""
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        index = int.from_bytes(digest[:8], 'little') % self._slot_count
+        insert_at = None
+        for _ in range(self._slot_count):
+            slot_hash, offset, _, state, _, _ = self._read_slot(index)
+            if state == EMPTY:
+                return None, insert_at if insert_at is not None else index
+            if state == DELETED:
+                if insert_at is None:
+                    insert_at = index
+            elif (slot_hash == digest
+                  and self._read_record(offset)[0] == key):
+                return index, index
+            index = (index + 1) % self._slot_count
+        return None, insert_at
+
+    def _drop(self, index, header):
+        slot = list(self._read_slot(index))
+        header['used'] -= slot[2]
+        header['entries'] -= 1
+        header['deleted'] += 1
+        slot[3] = DELETED
+        self._write_slot(index, *slot)
+
+    def _live(self, index, now):
+        _, _, _, state, expiry, _ = self._read_slot(index)
+        return state == USED and not (expiry and expiry <= now)
+
+    def _compact(self, header, needed):
+        now = time.time()
+        live = []
+        for index in range(self._slot_count):
+            if self._live(index, now):
+                _, offset, length, _, expiry, access = self._read_slot(index)
+                start = self._heap_start + offset
+                live.append(
+                    (access, expiry, bytes(self._map[start:start + length]))
+                )
+        live.sort(key=lambda item: item[0], reverse=True)
+        budget = int(self._heap_size * KEEP_RATIO) - needed
+        max_entries = min(self._max_entries,
+                          int(self._slot_count * MAX_LOAD)) - 1
+        self._map[HEADER.size:self._heap_start] = bytes(
+            self._heap_start - HEADER.size
+        )
+        header.update(heap_top=0, used=0, entries=0, deleted=0)
+        for access, expiry, record in live:
+            if (header['used'] + len(record) > budget
+                    or header['entries'] >= max_entries):
+                break
+            key_length = RECORD.unpack_from(record)[0]
+            key = record[RECORD.size:RECORD.size + key_length]
+            _, insert_at = self._find(key)
+            self._store(insert_at, key, record, expiry, access, header)
+
+    def _store(self, index, key, record, expiry, access, header):
+        offset = header['heap_top']
+        start = self._heap_start + offset
+        self._map[start:start + len(record)] = record
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        self._write_slot(index, digest, offset, len(record), USED,
+                         expiry, access)
+        header['heap_top'] += len(record)
+        header['used'] += len(record)
+        header['entries'] += 1
+
+    def _get(self, key, header, now):
+        index, _ = self._find(key)
+        if index is None:
+            return None
+        if not self._live(index, now):
+            self._drop(index, header)
+            return None
+        slot = list(self._read_slot(index))
+        header['tick'] += 1
+        slot[5] = header['tick']
+        self._write_slot(index, *slot)
+        return self._read_record(slot[1])[1]
+
+    def _set(self, key, value, timeout, header):
+        record = (RECORD.pack(len(key), len(value)) + key + value)
+        index, _ = self._find(key)
+        if index is not None:
+            self._drop(index, header)
+        if len(record) > self._heap_size // 2:
+            return False
+        if (header['heap_top'] + len(record) > self._heap_size
+                or header['entries'] + header['deleted'] + 1
+                > self._slot_count * MAX_LOAD
+                or header['entries'] >= self._max_entries):
+            self._compact(header, len(record))
+        _, insert_at = self._find(key)
+        expiry = self.get_backend_timeout(timeout) or 0.0
+        header['tick'] += 1
+        self._store(insert_at, key, record, expiry, header['tick'], header)
+        return True
+
+    @contextmanager
+    def _transaction(self):
+        with self._locked():
+            header = self._header()
+            yield header
+            self._write_header(**header)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key.encode()
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    # Публичный интерфейс BaseCache.
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        with self._transaction() as header:
+            value = self._get(key, header, time.time())
+        return default if value is None else pickle.loads(value)
+
+    def get_many(self, keys, version=None):
+        found = {}
+        now = time.time()
+        with self._transaction() as header:
+            for key in keys:
+                value = self._get(self._key(key, version), header, now)
+                if value is not None:
+                    found[key] = value
+        return {key: pickle.loads(value) for key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        value = self._dumps(value)
+        with self._transaction() as header:
+            self._set(key, value, timeout, header)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        data = {
+            self._key(key, version): self._dumps(value)
+            for key, value in data.items()
+        }
+        with self._transaction() as header:
+            for key, value in data.items():
+                self._set(key, value, timeout, header)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        value = self._dumps(value)
+        with self._transaction() as header:
+            if self._get(key, header, time.time()) is not None:
+                return False
+            return self._set(key, value, timeout, header)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._transaction() as header:
+            value = self._get(key, header, time.time())
+            if value is None:
+                return False
+            return self._set(key, bytes(value), timeout, header)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._transaction() as header:
+            now = time.time()
+            value = self._get(key, header, now)
+            if value is None:
+                raise ValueError("Key '%s' not found" % key.decode())
+            index, _ = self._find(key)
+            expiry = self._read_slot(index)[4]
+            new_value = pickle.loads(value) + delta
+            timeout = expiry - now if expiry else None
+            self._set(key, self._dumps(new_value), timeout, header)
+        return new_value
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        with self._transaction() as header:
+            index, _ = self._find(key)
+            if index is not None:
+                self._drop(index, header)
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        with self._transaction() as header:
+            return self._get(key, header, time.time()) is not None
+
+    def clear(self):
+        with self._locked():
+            self._reset()
+
+    def close(self, **kwargs):
+        # Отображение живёт всё время жизни процесса.
+        pass
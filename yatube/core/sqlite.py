@@ -0,0 +1,75 @@
+"""PRAGMA для каждого нового соединения с SQLite.
+
+По умолчанию база пишет журнал отката, и одна запись блокирует всех
+читателей. В режиме WAL читатели работают параллельно с писателем, а
+busy_timeout заставляет конкурентную запись подождать, а не сразу
+падать с "database is locked".
+
+Набор берётся из ключа PRAGMAS в настройках базы, иначе из
+SQLITE_PRAGMAS; значение None отключает PRAGMA:
+
+    SQLITE_PRAGMAS = {**core.sqlite.DEFAULT_PRAGMAS, 'mmap_size': None}
+
+busy_timeout не спасает отложенную транзакцию, которая сначала читала,
+а потом решила писать: SQLite отказывает ей сразу.
+"""
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# Порядок важен: busy_timeout раньше journal_mode, чтобы переключение
+# в WAL подождало чужую запись.
+DEFAULT_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'memory',
+}
+
+# Значения SQLite по умолчанию, для сравнения в benchmark_contention.
+BASELINE_PRAGMAS = {
+    'journal_mode': 'delete',
+    'synchronous': 'full',
+    'mmap_size': 0,
+    'cache_size': -2000,
+    'temp_store': 'default',
+}
+
+KNOWN = frozenset(DEFAULT_PRAGMAS)
+
+VALUE_RE = re.compile(r'^(-?\d+|[a-zA-Z]+)$')
+
+# В памяти журнала на диске нет, WAL там невозможен.
+FILE_ONLY = frozenset(('journal_mode', 'mmap_size'))
+
+
+def configured(settings_dict):
+    pragmas = settings_dict.get('PRAGMAS')
+    if pragmas is None:
+        pragmas = getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_PRAGMAS)
+    for name, value in pragmas.items():
+        # PRAGMA не принимает параметров, так что значения подставляются
+        # в текст и проверяются заранее.
+        if name not in KNOWN:
+            raise ImproperlyConfigured(f'Неизвестная PRAGMA {name}')
+        if value is not None and not VALUE_RE.match(str(value)):
+            raise ImproperlyConfigured(
+                f'Недопустимое значение PRAGMA {name}: {value!r}'
+            )
+    return {name: value for name, value in pragmas.items()
+            if value is not None}
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """Обработчик connection_created."""
+    if connection.vendor != 'sqlite':
+        return
+    in_memory = connection.is_in_memory_db()
+    # Напрямую через sqlite3: это не запросы приложения, их не должны
+    # видеть ни метрики, ни профилировщик.
+    for name, value in configured(connection.settings_dict).items():
+        if not (in_memory and name in FILE_ONLY):
+            connection.connection.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,15 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.page_cache import FRAGMENT_MARKER, is_shared_render
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def per_request(context, template_name):
+    request = context.get('request')
+    if request is not None and is_shared_render(request):
+        return mark_safe(FRAGMENT_MARKER.format(template_name))
+    fragment = context.template.engine.get_template(template_name)
+    return fragment.render(context)
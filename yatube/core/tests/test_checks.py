@@ -0,0 +1,63 @@
+import importlib
+import os
+from unittest import mock
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from core.checks import ensure_production_ready, production_settings
+
+PRODUCTION_ENV = {
+    'YATUBE_SECRET_KEY': 'secret',
+    'YATUBE_ALLOWED_HOSTS': 'example.com, www.example.com',
+}
+
+CHECKED = ('YATUBE_ENV', 'DEBUG', 'TEMPLATES', 'CACHES',
+           'STATICFILES_STORAGE')
+
+
+def production_module():
+    with mock.patch.dict(os.environ, PRODUCTION_ENV):
+        return importlib.reload(
+            importlib.import_module('yatube.settings.production')
+        )
+
+
+class ProductionSettingsTest(SimpleTestCase):
+    def test_development_is_not_checked(self):
+        self.assertEqual(production_settings(), [])
+
+    def test_production_profile_passes(self):
+        """Профиль production проходит свою же проверку"""
+        module = production_module()
+        self.assertEqual(module.ALLOWED_HOSTS,
+                         ['example.com', 'www.example.com'])
+        database = module.DATABASES['default']
+        # Сами DATABASES не подменяем: на них держится тестовая база.
+        with override_settings(**{name: getattr(module, name)
+                                  for name in CHECKED}), mock.patch.dict(
+                settings.DATABASES['default'],
+                CONN_MAX_AGE=database['CONN_MAX_AGE']):
+            self.assertEqual(production_settings(), [])
+            ensure_production_ready()
+
+    def test_required_variables(self):
+        with mock.patch.dict(os.environ, {'YATUBE_SECRET_KEY': 'secret'}):
+            os.environ.pop('YATUBE_ALLOWED_HOSTS', None)
+            with self.assertRaisesMessage(ImproperlyConfigured,
+                                          'YATUBE_ALLOWED_HOSTS'):
+                importlib.reload(
+                    importlib.import_module('yatube.settings.production')
+                )
+
+    @override_settings(YATUBE_ENV='production', DEBUG=True)
+    def test_debug_slow_paths_refuse_to_boot(self):
+        """Отладочные настройки в продакшене не дают запуститься"""
+        self.assertEqual(
+            [error.id for error in production_settings()],
+            ['yatube.E002', 'yatube.E003', 'yatube.E001', 'yatube.E004',
+             'yatube.E005']
+        )
+        with self.assertRaisesMessage(ImproperlyConfigured, 'DEBUG'):
+            ensure_production_ready()
@@ -0,0 +1,140 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+from posts.models import Post
+
+User = get_user_model()
+
+
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='metrics_author')
+        cls.staff = User.objects.create_user(username='metrics_staff',
+                                             is_staff=True)
+        Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def scrape(self, **headers):
+        return self.staff_client.get(reverse('metrics'), **headers)
+
+    def test_records_view(self):
+        """Запросы, SQL, шаблоны, кэш и размер пишутся по имени адреса"""
+        first = self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        self.client.get('/no/such/page/')
+        histograms, counters = metrics.collect()
+        view = (('view', 'posts:index'),)
+        duration = histograms[('yatube_request_duration_seconds', view)]
+        self.assertEqual(sum(duration[:-1]), 2)
+        queries = histograms[('yatube_sql_queries', view)]
+        self.assertGreater(queries[-1], 0)
+        self.assertGreater(
+            histograms[('yatube_template_render_seconds', view)][-1], 0
+        )
+        self.assertEqual(
+            histograms[('yatube_response_size_bytes', view)][-1],
+            2 * len(first.content)
+        )
+        # Первый раз страница рисуется, второй берётся из кэша.
+        self.assertGreater(counters[('yatube_cache_misses_total', view)], 0)
+        self.assertGreater(counters[('yatube_cache_hits_total', view)], 0)
+        self.assertEqual(
+            counters[('yatube_responses_total',
+                      (('status', '200'), ('view', 'posts:index')))], 2
+        )
+        self.assertIn(
+            ('yatube_responses_total',
+             (('status', '404'), ('view', metrics.UNRESOLVED))), counters
+        )
+
+    def test_endpoint_is_protected(self):
+        """/metrics отдаётся персоналу и по токену, остальным - 403"""
+        self.assertEqual(self.client.get(reverse('metrics')).status_code,
+                         403)
+        reader = User.objects.create_user(username='metrics_reader')
+        self.client.force_login(reader)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code,
+                         403)
+        self.assertEqual(self.scrape().status_code, 200)
+        with override_settings(METRICS_TOKEN='secret'):
+            anonymous = Client()
+            self.assertEqual(anonymous.get(
+                reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret'
+            ).status_code, 200)
+            self.assertEqual(anonymous.get(
+                reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong'
+            ).status_code, 403)
+
+    def test_prometheus_format(self):
+        """Корзины гистограмм накопительные, есть _sum и _count"""
+        self.client.get(reverse('posts:index'))
+        response = self.scrape()
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        lines = response.content.decode().splitlines()
+        self.assertIn('# TYPE yatube_sql_queries histogram', lines)
+        buckets = [line for line in lines if line.startswith(
+            'yatube_sql_queries_bucket{view="posts:index"'
+        )]
+        counts = [int(line.rsplit(' ', 1)[1]) for line in buckets]
+        self.assertEqual(counts, sorted(counts))
+        self.assertEqual(counts[-1], 1)
+        self.assertTrue(buckets[-1].startswith(
+            'yatube_sql_queries_bucket{view="posts:index",le="+Inf"}'
+        ))
+        self.assertIn('yatube_sql_queries_count{view="posts:index"} 1',
+                      lines)
+
+    def test_workers_are_merged(self):
+        """/metrics складывает снимки всех воркеров из METRICS_DIR"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        with override_settings(METRICS_DIR=directory,
+                               METRICS_FLUSH_INTERVAL=0):
+            self.client.get(reverse('posts:index'))
+            own = os.path.join(directory, metrics.registry.file_name)
+            with open(own, encoding='utf-8') as source:
+                snapshot = json.load(source)
+            # Второй воркер обслужил тот же адрес.
+            with open(os.path.join(directory, '1-other.json'), 'w',
+                      encoding='utf-8') as target:
+                json.dump(snapshot, target)
+            text = self.scrape().content.decode()
+        self.assertIn('yatube_request_duration_seconds_count'
+                      '{view="posts:index"} 2', text)
+        self.assertIn('yatube_responses_total'
+                      '{status="200",view="posts:index"} 2', text)
+
+    def test_dead_workers_are_pruned(self):
+        """Снимки завершившихся воркеров удаляются при сборе"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        worker = subprocess.Popen([sys.executable, '-c', ''])
+        worker.wait()
+        self.client.get(reverse('posts:index'))
+        dead = [f'{worker.pid}-dead.json', f'{worker.pid}-dead.json.tmp']
+        for name in dead:
+            with open(os.path.join(directory, name), 'w',
+                      encoding='utf-8') as target:
+                json.dump(metrics.registry.snapshot(), target)
+        with override_settings(METRICS_DIR=directory):
+            histograms, counters = metrics.collect()
+        self.assertEqual(os.listdir(directory), [])
+        series = histograms[('yatube_request_duration_seconds',
+                             (('view', 'posts:index'),))]
+        self.assertEqual(sum(series[:-1]), 1)
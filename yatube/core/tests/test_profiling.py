@@ -0,0 +1,109 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.models import RequestProfile
+from posts.models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ProfilerTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='profiled')
+        cls.admin = User.objects.create_superuser(
+            username='profiler', email='profiler@example.com',
+            password='password'
+        )
+        Post.objects.create(author=cls.author, text='Пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.staff_client = Client()
+        self.staff_client.force_login(self.admin)
+        self.url = reverse('posts:profile', args=(self.author.username,))
+
+    def test_switch_is_staff_only(self):
+        """Без переключателя и не для персонала профиль не снимается"""
+        self.staff_client.get(self.url)
+        reader = Client()
+        reader.force_login(self.author)
+        response = reader.get(self.url, {'_profile': 'trace'},
+                              HTTP_X_PROFILE='trace')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_trace_profile(self):
+        """trace сохраняет стеки с функцией представления и SQL"""
+        response = self.staff_client.get(self.url, {'_profile': 'trace'})
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual(profile.view_name, 'posts:profile')
+        self.assertEqual(profile.mode, 'trace')
+        self.assertEqual(profile.status_code, 200)
+        self.assertEqual(profile.user, self.admin)
+        lines = profile.stacks.splitlines()
+        self.assertTrue(any('profile (posts/views.py' in line
+                            for line in lines))
+        for line in lines:
+            self.assertTrue(line.rsplit(' ', 1)[1].isdigit())
+        queries = json.loads(profile.queries)
+        self.assertEqual(len(queries), profile.query_count)
+        self.assertGreater(profile.query_count, 0)
+        starts = [query['start_ms'] for query in queries]
+        self.assertEqual(starts, sorted(starts))
+
+    def test_sample_profile_by_header(self):
+        """Заголовок X-Profile включает выборочный профиль"""
+        response = self.staff_client.get(self.url, HTTP_X_PROFILE='1')
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual(profile.mode, 'sample')
+
+    def test_admin_shows_profile(self):
+        """Профиль открывается в админке с горячими функциями и SQL"""
+        response = self.staff_client.get(self.url, {'_profile': 'trace'})
+        page = self.staff_client.get(reverse(
+            'admin:core_requestprofile_change',
+            args=(response['X-Profile-Id'],)
+        ))
+        self.assertEqual(page.status_code, 200)
+        self.assertContains(page, 'Собственное время')
+        self.assertContains(page, 'SELECT')
+        listing = self.staff_client.get(
+            reverse('admin:core_requestprofile_changelist')
+        )
+        self.assertContains(listing, 'posts:profile')
+
+    def test_profile_is_private(self):
+        """Профиль не попадает в MEDIA_ROOT и скачивается только из
+        админки"""
+        response = self.staff_client.get(self.url, {'_profile': 'trace'})
+        self.assertEqual(os.listdir(TEMP_MEDIA_ROOT), [])
+        url = reverse('admin:core_requestprofile_download',
+                      args=(response['X-Profile-Id'], 'queries'))
+        download = self.staff_client.get(url)
+        self.assertEqual(download.status_code, 200)
+        self.assertIn('attachment', download['Content-Disposition'])
+        self.assertEqual(len(json.loads(download.content)),
+                         RequestProfile.objects.get().query_count)
+        reader = Client()
+        reader.force_login(self.author)
+        self.assertEqual(reader.get(url).status_code, 302)
+        self.assertEqual(self.staff_client.get(url.replace(
+            'queries', 'user'
+        )).status_code, 404)
@@ -0,0 +1,33 @@
+from unittest import mock
+
+from django.db.models.query import QuerySet
+from django.test import Client, TestCase
+
+from core import query_budget
+
+
+class QueryBudgetTest(TestCase):
+    def test_every_view_has_budget(self):
+        self.assertEqual(query_budget.missing(), [])
+
+    def test_exceeded_budget_reports_sql(self):
+        """Превышение бюджета называет адрес и показывает запросы"""
+        budget = query_budget.Budget(1)
+        with self.assertRaises(query_budget.BudgetExceeded) as raised:
+            query_budget.check('posts:profile', budget,
+                               query_budget.Dataset(), Client())
+        message = str(raised.exception)
+        self.assertIn('posts:profile: бюджет 1 запросов превышен', message)
+        self.assertIn('/profile/budget_author/', message)
+        self.assertIn('SELECT', message)
+
+    def test_growth(self):
+        """N+1 не проходит даже при большом бюджете"""
+        budget = query_budget.Budget(100)
+        # Без select_related карточки читают авторов по одному.
+        with mock.patch.object(QuerySet, 'select_related',
+                               lambda queryset, *fields: queryset):
+            with self.assertRaisesMessage(query_budget.BudgetExceeded,
+                                          'с ростом данных'):
+                query_budget.check('posts:group', budget,
+                                   query_budget.Dataset(), Client())
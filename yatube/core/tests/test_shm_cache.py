@@ -0,0 +1,78 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from django.test import SimpleTestCase
+from core.shm_cache import SharedMemoryCache
+
+
+def make_cache(path, max_bytes=64 * 1024, max_entries=300):
+    return SharedMemoryCache(path, {
+        'OPTIONS': {'MAX_BYTES': max_bytes, 'MAX_ENTRIES': max_entries}
+    })
+
+
+def child_set(path):
+    cache = make_cache(path)
+    cache.set('from_child', os.getpid())
+    for _ in range(200):
+        cache.incr('counter')
+
+
+class SharedMemoryCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'cache')
+        self.cache = make_cache(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_get_set_delete(self):
+        """Базовые операции кэша работают как у LocMemCache"""
+        self.cache.set('key', {'value': [1, 2]})
+        self.assertEqual(self.cache.get('key'), {'value': [1, 2]})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': 2})
+        self.assertEqual(self.cache.incr('a', 10), 11)
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_expiry(self):
+        """Запись пропадает по истечении timeout"""
+        self.cache.set('key', 'value', 0.05)
+        self.assertEqual(self.cache.get('key'), 'value')
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_lru_eviction_by_size(self):
+        """При переполнении вытесняются давно не читавшиеся записи"""
+        cache = make_cache(self.path + '-small', max_bytes=8 * 1024)
+        cache.set('hot', 'x' * 500)
+        for i in range(40):
+            cache.set(f'cold-{i}', 'x' * 500)
+            self.assertIsNotNone(cache.get('hot'))
+        self.assertIsNone(cache.get('cold-0'))
+        self.assertIsNotNone(cache.get('cold-39'))
+        self.assertLessEqual(
+            os.path.getsize(self.path + '-small'),
+            cache._heap_start + 8 * 1024
+        )
+
+    def test_shared_between_processes(self):
+        """Процессы видят общие записи, а incr атомарен между ними"""
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=child_set, args=(self.path,))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertIsNotNone(self.cache.get('from_child'))
+        self.assertEqual(self.cache.get('counter'), 800)
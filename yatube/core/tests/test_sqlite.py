@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, override_settings
+
+from core.sqlite import BASELINE_PRAGMAS, DEFAULT_PRAGMAS, configured
+
+
+class SqlitePragmasTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'db.sqlite3')
+
+    def open(self, **settings_dict):
+        wrapper = DatabaseWrapper({**connection.settings_dict,
+                                   'NAME': self.path, **settings_dict})
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        return wrapper.connection.execute(f'PRAGMA {name}').fetchone()[0]
+
+    @override_settings(SQLITE_PRAGMAS=DEFAULT_PRAGMAS)
+    def test_new_connection_gets_pragmas(self):
+        """Каждое новое соединение сразу в WAL и с busy_timeout"""
+        wrapper = self.open()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'temp_store'), 2)
+        self.assertEqual(self.pragma(wrapper, 'cache_size'), -64 * 1024)
+
+    def test_per_database_pragmas(self):
+        """PRAGMAS в настройках базы важнее SQLITE_PRAGMAS"""
+        wrapper = self.open(PRAGMAS=BASELINE_PRAGMAS)
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 2)
+
+    def test_none_disables_pragma(self):
+        pragmas = configured({'PRAGMAS': {**DEFAULT_PRAGMAS,
+                                          'mmap_size': None}})
+        self.assertNotIn('mmap_size', pragmas)
+
+    def test_rejects_unsafe_pragmas(self):
+        """В текст PRAGMA не попадает ничего, кроме чисел и слов"""
+        for pragmas in ({'writable_schema': 1},
+                        {'journal_mode': 'wal; DROP TABLE posts_post'}):
+            with self.assertRaises(ImproperlyConfigured):
+                configured({'PRAGMAS': pragmas})
@@ -0,0 +1,69 @@
+import io
+from django import forms
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+from core.uploads import clean_image
+
+
+def image_file(size, image_format='JPEG', name='image.jpg'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type='image/jpeg')
+
+
+def clean(upload):
+    return clean_image(forms.ImageField().clean(upload))
+
+
+class CleanImageTest(SimpleTestCase):
+    def test_accepts_small_image(self):
+        """Небольшая картинка проходит без изменений"""
+        upload = image_file((300, 100))
+        self.assertIs(clean(upload), upload)
+
+    @override_settings(UPLOAD_MAX_BYTES=100)
+    def test_rejects_large_file(self):
+        """Файл больше UPLOAD_MAX_BYTES отклоняется"""
+        with self.assertRaisesMessage(ValidationError, 'Файл больше'):
+            clean(image_file((300, 100)))
+
+    def test_rejects_too_many_pixels(self):
+        """Огромные размеры в заголовке отклоняются до декодирования"""
+        gif = bytearray(
+            b'GIF89a\x01\x00\x01\x00\x00\x00\x00!\xf9\x04\x01\n\x00\x01'
+            b'\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02L\x01\x00;'
+        )
+        gif[6:10] = (8000).to_bytes(2, 'little') * 2
+        upload = SimpleUploadedFile('bomb.gif', bytes(gif),
+                                    content_type='image/gif')
+        with self.assertRaisesMessage(ValidationError, 'мегапикселей'):
+            clean(upload)
+
+    @override_settings(IMAGE_MAX_PIXELS=1_000_000,
+                       IMAGE_MAX_DECODED_PIXELS=100_000)
+    def test_decoded_formats_have_lower_limit(self):
+        """PNG декодируется целиком, и для него предел пикселей ниже,
+        чем для JPEG"""
+        self.assertIsInstance(clean(image_file((500, 500))),
+                              SimpleUploadedFile)
+        with self.assertRaisesMessage(ValidationError, 'мегапикселей'):
+            clean(image_file((500, 500), 'PNG', 'image.png'))
+
+    def test_rejects_not_image(self):
+        """Не картинка отклоняется"""
+        upload = SimpleUploadedFile('text.jpg', b'not an image',
+                                    content_type='image/jpeg')
+        with self.assertRaises(ValidationError):
+            clean(upload)
+
+    @override_settings(IMAGE_MAX_SIDE=500)
+    def test_downscales_large_image(self):
+        """Оригинал шире IMAGE_MAX_SIDE уменьшается с сохранением формата
+        и пропорций"""
+        cleaned = clean(image_file((1500, 600)))
+        image = Image.open(cleaned)
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, (500, 200))
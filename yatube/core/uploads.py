@@ -0,0 +1,98 @@
+"""Загрузка картинок с ограниченным расходом памяти.
+
+Обработчик пишет любую загрузку на диск кусками и перестаёт писать,
+как только файл превысил UPLOAD_MAX_BYTES. ImageField формы читает
+только заголовок картинки, а clean_image() по нему проверяет размер,
+формат и число пикселей и уменьшает слишком большие оригиналы.
+
+Не разворачивается в память целиком только JPEG: его draft() Pillow
+уменьшает ещё при декодировании. PNG, GIF и WebP декодируются в полном
+размере, поэтому для них действует меньший предел
+IMAGE_MAX_DECODED_PIXELS вместо IMAGE_MAX_PIXELS.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import (TemporaryUploadedFile,
+                                            UploadedFile)
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image
+
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+
+class BoundedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл, но не больше UPLOAD_MAX_BYTES.
+
+    Остаток файла дочитывается из запроса и выбрасывается, а размер в
+    file.size остаётся настоящим, чтобы форма могла отказать.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received <= settings.UPLOAD_MAX_BYTES:
+            super().receive_data_chunk(raw_data, start)
+
+
+def _open(data):
+    if hasattr(data, 'temporary_file_path'):
+        return Image.open(data.temporary_file_path())
+    data.seek(0)
+    return Image.open(data)
+
+
+def downscale(image, image_format, name, content_type):
+    """Уменьшает картинку до IMAGE_MAX_SIDE и пишет её во временный файл."""
+    side = settings.IMAGE_MAX_SIDE
+    # Для JPEG draft() уменьшает ещё при декодировании; остальные
+    # форматы уже в памяти целиком, reducing_gap лишь ускоряет ресайз.
+    image.draft('RGB', (side, side))
+    image.thumbnail((side, side), reducing_gap=2.0)
+    result = TemporaryUploadedFile(name, content_type, 0, None)
+    image.save(result.file, image_format, quality=85)
+    result.size = result.file.tell()
+    return result
+
+
+def clean_image(upload):
+    """Проверяет загруженную картинку и при необходимости уменьшает её.
+
+    Ждёт значение, уже прошедшее forms.ImageField: у него есть
+    upload.image с разобранным заголовком. Прочие значения, например
+    уже сохранённый файл при редактировании, возвращает как есть.
+    """
+    if not isinstance(upload, UploadedFile):
+        return upload
+    if upload.size > settings.UPLOAD_MAX_BYTES:
+        raise ValidationError(
+            'Файл больше %(limit)s МБ.',
+            code='too_large',
+            params={'limit': settings.UPLOAD_MAX_BYTES // 2 ** 20},
+        )
+    image_format = upload.image.format
+    if image_format not in ALLOWED_FORMATS:
+        raise ValidationError(
+            'Поддерживаются только JPEG, PNG, GIF и WebP.',
+            code='bad_format',
+        )
+    width, height = upload.image.size
+    limit = (settings.IMAGE_MAX_PIXELS if image_format == 'JPEG'
+             else settings.IMAGE_MAX_DECODED_PIXELS)
+    if width * height > limit:
+        raise ValidationError(
+            'Картинка больше %(limit)s мегапикселей.',
+            code='too_many_pixels',
+            params={'limit': limit // 10 ** 6},
+        )
+    if max(width, height) <= settings.IMAGE_MAX_SIDE:
+        return upload
+    try:
+        return downscale(_open(upload), image_format, upload.name,
+                         upload.content_type)
+    except Exception as exc:
+        raise ValidationError(
+            'Не удалось уменьшить картинку.', code='invalid_image'
+        ) from exc
@@ -1,4 +1,10 @@
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from core import metrics as request_metrics
 
 
 def page_not_found(request, exception):
@@ -15,3 +21,14 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def metrics(request):
+    """Метрики запросов для Prometheus: для персонала или по токену."""
+    token = settings.METRICS_TOKEN
+    sent = request.META.get('HTTP_AUTHORIZATION', '')
+    if not (request.user.is_staff
+            or token and constant_time_compare(sent, f'Bearer {token}')):
+        raise PermissionDenied
+    return HttpResponse(request_metrics.render(*request_metrics.collect()),
+                        content_type=request_metrics.CONTENT_TYPE)
@@ -0,0 +1,167 @@
+"""JSON API только для чтения: ленты и страница поста.
+
+Страницы адресуются теми же курсорами ?after=/?before=, что и в HTML.
+С ?since_id=N в ответ попадают только посты (на странице поста -
+комментарии) новее N. Если таких нет, ответ 204 без тела: наличие
+новых записей проверяется по индексу, без чтения самих строк.
+"""
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+
+from core.paginator import KeysetPaginator
+from posts.models import Comment, FeedEntry, Group, Post
+from yatube.settings import QUANTITY_COMMENT, QUANTITY_POST
+
+User = get_user_model()
+
+POST_FIELDS = ('id', 'text', 'pub_date', 'image', 'comments_count',
+               'author__username', 'group__slug')
+
+
+def serialize_post(post):
+    return {
+        'id': post.pk,
+        'author': post.author.username,
+        'group': post.group and post.group.slug,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'image': post.image.url if post.image else None,
+        'comments': post.comments_count,
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.pk,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    }
+
+
+def json_response(data, **kwargs):
+    return JsonResponse(data, json_dumps_params={
+        'ensure_ascii': False,
+        'separators': (',', ':'),
+    }, **kwargs)
+
+
+def since_id(request):
+    try:
+        return int(request.GET['since_id'])
+    except (KeyError, ValueError):
+        return None
+
+
+def page(request, object_list, serialize, per_page=QUANTITY_POST,
+         date_field='pub_date'):
+    page_obj = KeysetPaginator(
+        object_list, per_page, date_field=date_field
+    ).get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before')
+    )
+    return {
+        'results': [serialize(obj) for obj in page_obj],
+        'next': page_obj.next_cursor,
+        'previous': page_obj.previous_cursor,
+    }
+
+
+def newer(request, object_list, anchors=Post.objects, date_field='pub_date',
+          anchor_key='pk'):
+    """Выборка, суженная по ?since_id, или None, если новых записей нет.
+
+    «Новее» значит выше в ленте: граница ставится по (дата, pk) записи
+    из anchors, у которой anchor_key равен since_id. Это тот же ключ, по
+    которому сортирована лента, поэтому выборка идёт по её индексу без
+    сортировки. Если такой записи нет, новее всё, у чего anchor_key
+    больше since_id.
+    """
+    since = since_id(request)
+    if since is None:
+        return object_list
+    bound = anchors.filter(**{anchor_key: since}).values_list(
+        date_field, 'pk'
+    )[:1]
+    if bound:
+        date, pk = bound[0]
+        object_list = object_list.filter(
+            Q(**{f'{date_field}__gt': date})
+            | Q(**{date_field: date, 'pk__gt': pk})
+        )
+    else:
+        object_list = object_list.filter(**{f'{anchor_key}__gt': since})
+    # exists() не тянет select_related: хватает индекса ленты.
+    if not object_list.exists():
+        return None
+    return object_list
+
+
+def posts_response(request, post_list):
+    post_list = newer(request, post_list)
+    if post_list is None:
+        return HttpResponse(status=HTTPStatus.NO_CONTENT)
+    post_list = post_list.select_related('author', 'group').only(
+        *POST_FIELDS
+    )
+    return json_response(page(request, post_list, serialize_post))
+
+
+def index(request):
+    return posts_response(request, Post.objects.all())
+
+
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return posts_response(request, Post.objects.filter(group=group))
+
+
+def profile(request, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return posts_response(request, Post.objects.filter(author=author))
+
+
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return json_response({'detail': 'Нужна авторизация'},
+                             status=HTTPStatus.UNAUTHORIZED)
+    # since_id - id поста, а лента сортирована по своим записям: граница
+    # берётся по записи этого поста в ленте читателя.
+    entries = FeedEntry.objects.filter(user=request.user)
+    feed = newer(request, entries, entries, anchor_key='post_id')
+    if feed is None:
+        return HttpResponse(status=HTTPStatus.NO_CONTENT)
+    feed = feed.select_related('post__author', 'post__group').only(
+        'pub_date', *(f'post__{field}' for field in POST_FIELDS)
+    )
+    return json_response(page(
+        request, feed, lambda entry: serialize_post(entry.post)
+    ))
+
+
+def post_detail(request, post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group').only(*POST_FIELDS),
+        id=post_id
+    )
+    comments = newer(request, post.comments.all(), Comment.objects,
+                     date_field='created')
+    if comments is None:
+        return HttpResponse(status=HTTPStatus.NO_CONTENT)
+    return json_response({
+        'post': serialize_post(post),
+        'comments': page(
+            request,
+            comments.select_related('author').only(
+                'text', 'created', 'post_id', 'author__username'
+            ),
+            serialize_comment,
+            per_page=QUANTITY_COMMENT,
+            date_field='created'
+        ),
+    })
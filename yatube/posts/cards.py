@@ -0,0 +1,72 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts import thumbnails
+
+CARD_TEMPLATE = 'includes/card.html'
+
+
+def version_key(kind, pk):
+    return f'card_version:{kind}:{pk}'
+
+
+def bump(kind, pk):
+    """Меняет версию объекта, от которого зависят карточки постов."""
+    cache.set(version_key(kind, pk), uuid.uuid4().hex, None)
+
+
+def _versions(posts):
+    keys = set()
+    for post in posts:
+        keys.update((
+            version_key('post', post.pk),
+            version_key('user', post.author_id),
+            version_key('group', post.group_id),
+        ))
+    versions = cache.get_many(keys)
+    # Пропавшая версия получает новое значение, а не значение по
+    # умолчанию: иначе могла бы ожить устаревшая карточка.
+    missing = {key: uuid.uuid4().hex for key in keys - versions.keys()}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return versions
+
+
+def attach(posts, show_author=False, show_group=False):
+    """Подставляет post.card_html из кэша, дорисовывая недостающие."""
+    posts = list(posts)
+    versions = _versions(posts)
+    flags = f'{int(bool(show_author))}{int(bool(show_group))}'
+    keys = {
+        post.pk: 'card:{}:{}:{}:{}:{}'.format(
+            post.pk,
+            versions[version_key('post', post.pk)],
+            versions[version_key('user', post.author_id)],
+            versions[version_key('group', post.group_id)],
+            flags,
+        )
+        for post in posts
+    }
+    cards = cache.get_many(keys.values())
+    # Миниатюры нужны только карточкам, которых нет в кэше.
+    thumbnails.prefetch(
+        [post for post in posts if keys[post.pk] not in cards]
+    )
+    rendered = {}
+    for post in posts:
+        key = keys[post.pk]
+        if key not in cards:
+            cards[key] = rendered[key] = render_to_string(CARD_TEMPLATE, {
+                'post': post,
+                'show_author': show_author,
+                'show_group': show_group,
+            })
+        post.card_html = mark_safe(cards[key])
+    if rendered:
+        cache.set_many(rendered, settings.CARD_CACHE_TIMEOUT)
+    return posts
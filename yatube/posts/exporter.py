@@ -0,0 +1,68 @@
+"""Потоковая выгрузка постов, комментариев и подписок пользователя.
+
+Формат тот же, что читает posts.importer: JSONL или CSV, одна запись на
+строку. Строки идут из базы итератором (на PostgreSQL это курсор на
+стороне сервера) пачками по CHUNK_SIZE и сразу уходят клиенту, поэтому
+память не растёт с размером аккаунта.
+"""
+import csv
+import json
+
+from posts.models import Comment, Follow, Post
+
+CHUNK_SIZE = 2000
+
+FIELDS = ('type', 'id', 'post', 'author', 'user', 'group', 'text',
+          'pub_date', 'created')
+
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def records(user, chunk_size=CHUNK_SIZE):
+    """Записи пользователя по одной: посты, комментарии, подписки."""
+    posts = Post.objects.filter(author=user).order_by('pk').values_list(
+        'pk', 'group__slug', 'text', 'pub_date'
+    )
+    for pk, slug, text, pub_date in posts.iterator(chunk_size=chunk_size):
+        record = {'type': 'post', 'id': pk, 'author': user.username,
+                  'text': text, 'pub_date': pub_date.isoformat()}
+        if slug:
+            record['group'] = slug
+        yield record
+    comments = Comment.objects.filter(author=user).order_by(
+        'pk'
+    ).values_list('post_id', 'text', 'created')
+    for post_id, text, created in comments.iterator(chunk_size=chunk_size):
+        yield {'type': 'comment', 'post': post_id, 'author': user.username,
+               'text': text, 'created': created.isoformat()}
+    follows = Follow.objects.filter(user=user).order_by('pk').values_list(
+        'author__username', flat=True
+    )
+    for author in follows.iterator(chunk_size=chunk_size):
+        yield {'type': 'follow', 'user': user.username, 'author': author}
+
+
+class _Echo:
+    """Файл для csv.writer, который просто возвращает строку."""
+
+    def write(self, value):
+        return value
+
+
+def render(rows, file_format):
+    """Строки файла по одной."""
+    if file_format == 'csv':
+        writer = csv.DictWriter(_Echo(), FIELDS)
+        yield writer.writeheader()
+        for row in rows:
+            yield writer.writerow(row)
+        return
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def stream(user, file_format, chunk_size=CHUNK_SIZE):
+    return render(records(user, chunk_size), file_format)
@@ -0,0 +1,101 @@
+from collections import defaultdict
+from itertools import islice
+
+from django.db import transaction
+
+from posts.models import FeedEntry, Follow, Post
+
+BATCH_SIZE = 1000
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _insert(entries, batch_size=BATCH_SIZE):
+    for chunk in _chunks(entries, batch_size):
+        FeedEntry.objects.bulk_create(chunk, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _insert(
+        FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def fan_out_many(posts, batch_size=BATCH_SIZE):
+    """Раскладывает пачку новых постов по лентам подписчиков авторов."""
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+    if not by_author:
+        return
+    follows = Follow.objects.filter(
+        author_id__in=by_author
+    ).values_list('user_id', 'author_id')
+    _insert(
+        (FeedEntry(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+         for user_id, author_id in follows.iterator()
+         for post in by_author[author_id]),
+        batch_size
+    )
+
+
+def backfill(user_id, author_id, batch_size=BATCH_SIZE):
+    """Добавляет в ленту подписчика уже написанные посты автора."""
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')
+    entries = (
+        FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in posts.iterator()
+    )
+    _insert(entries, batch_size)
+
+
+def drop(user_id, author_id):
+    """Убирает посты автора из ленты бывшего подписчика."""
+    FeedEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id
+    ).delete()
+
+
+def rebuild(batch_size=BATCH_SIZE):
+    """Заново собирает ленты подписок, каждую в своей транзакции.
+
+    Читатель видит либо старую ленту, либо уже собранную новую, а не
+    пустую на время пересборки. Возвращает число пересобранных лент.
+    """
+    FeedEntry.objects.exclude(
+        user_id__in=Follow.objects.values('user_id')
+    ).delete()
+    followers = Follow.objects.order_by('user_id').values_list(
+        'user_id', flat=True
+    ).distinct()
+    total = 0
+    for user_id in followers.iterator():
+        with transaction.atomic():
+            FeedEntry.objects.filter(user_id=user_id).delete()
+            posts = Post.objects.filter(
+                author_id__in=Follow.objects.filter(
+                    user_id=user_id
+                ).values('author_id')
+            ).values_list('pk', 'pub_date')
+            _insert(
+                (FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+                 for pk, pub_date in posts.iterator()),
+                batch_size
+            )
+        total += 1
+    return total
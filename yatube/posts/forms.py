@@ -1,15 +1,37 @@
 from django import forms
 from django.contrib.auth import get_user_model
-from posts.models import Post, Comment
+from django.core.cache import cache
+from core.uploads import clean_image
+from posts.models import Post, Comment, Group
 
 User = get_user_model()
 
+GROUP_CHOICES_KEY = 'group_choices'
+
+
+def group_choices():
+    """Варианты поля group, общие для всех форм и строк админки."""
+    choices = cache.get(GROUP_CHOICES_KEY)
+    if choices is None:
+        choices = [('', '---------')] + [
+            (group.pk, str(group)) for group in Group.objects.only('title')
+        ]
+        cache.set(GROUP_CHOICES_KEY, choices, None)
+    return choices
+
 
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['group'].choices = group_choices()
+
+    def clean_image(self):
+        return clean_image(self.cleaned_data['image'])
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
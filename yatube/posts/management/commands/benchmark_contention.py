@@ -0,0 +1,276 @@
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import F
+
+from core.sqlite import BASELINE_PRAGMAS
+from posts.management.commands.benchmark_views import percentile
+from posts.models import Comment, Post
+
+ALIAS = 'contention'
+
+SAMPLE_SIZE = 1000
+
+# Сколько пишущих пачек идёт прямо сейчас; общий для потоков и
+# процессов, читатели по нему делят свои чтения на две корзины.
+_bursting = None
+
+
+def _share(bursting):
+    global _bursting
+    _bursting = bursting
+
+
+def _locked(error):
+    if 'locked' not in str(error):
+        raise error
+
+
+def read_worker(duration, posts, seed):
+    """Читает то же, что главная и страница поста, пока не выйдет время."""
+    rng = random.Random(seed)
+    latencies = []
+    totals = {'quiet': [0, 0.0], 'bursting': [0, 0.0]}
+    errors = 0
+    deadline = time.monotonic() + duration
+    try:
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                list(Post.objects.using(ALIAS).select_related(
+                    'author', 'group'
+                )[:settings.QUANTITY_POST])
+                list(Comment.objects.using(ALIAS).filter(
+                    post_id=rng.choice(posts)
+                ).select_related('author')[:settings.QUANTITY_COMMENT])
+            except OperationalError as error:
+                _locked(error)
+                errors += 1
+                continue
+            elapsed = time.perf_counter() - started
+            latencies.append(elapsed)
+            bucket = totals['bursting' if _bursting.value else 'quiet']
+            bucket[0] += 1
+            bucket[1] += elapsed
+    finally:
+        connections[ALIAS].close()
+    return {'latencies': latencies, 'totals': totals, 'errors': errors}
+
+
+def write_worker(duration, posts, authors, burst, pause, seed):
+    """Пачками добавляет комментарии, между пачками отдыхает."""
+    rng = random.Random(seed)
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + duration
+    try:
+        while time.monotonic() < deadline:
+            with _bursting.get_lock():
+                _bursting.value += 1
+            try:
+                for _ in range(burst):
+                    started = time.perf_counter()
+                    post = rng.choice(posts)
+                    try:
+                        # Те же записи, что у add_comment, но без сигналов:
+                        # они писали бы в основную базу.
+                        with transaction.atomic(using=ALIAS):
+                            Comment.objects.using(ALIAS).bulk_create([
+                                Comment(post_id=post,
+                                        author_id=rng.choice(authors),
+                                        text='Комментарий под нагрузкой')
+                            ])
+                            Post.objects.using(ALIAS).filter(
+                                pk=post
+                            ).update(comments_count=F('comments_count') + 1)
+                    except OperationalError as error:
+                        _locked(error)
+                        errors += 1
+                        continue
+                    latencies.append(time.perf_counter() - started)
+            finally:
+                with _bursting.get_lock():
+                    _bursting.value -= 1
+            time.sleep(pause)
+    finally:
+        connections[ALIAS].close()
+    return {'latencies': latencies, 'errors': errors}
+
+
+def _ms(timings, share):
+    value = percentile(timings, share)
+    return None if value is None else round(value * 1000, 2)
+
+
+def _rate(count, seconds):
+    return round(count / seconds, 1) if seconds else None
+
+
+class Command(BaseCommand):
+    help = ('Нагружает копию базы SQLite параллельными чтениями и пачками '
+            'записей из потоков и процессов и сравнивает пропускную '
+            'способность чтения во время записи с PRAGMA из core.sqlite '
+            'и без них')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=5.0,
+                            help='Секунд на каждый прогон')
+        parser.add_argument('--burst', type=int, default=20,
+                            help='Записей в пачке')
+        parser.add_argument('--pause', type=float, default=0.2,
+                            help='Пауза между пачками, секунд')
+        parser.add_argument('--mode', choices=('threads', 'processes',
+                                               'both'), default='both')
+        parser.add_argument('--profile', choices=('tuned', 'baseline',
+                                                  'both'), default='both')
+        parser.add_argument('--output', help='Куда записать JSON')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Бенчмарк только для SQLite')
+        posts = list(Post.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        )[:SAMPLE_SIZE])
+        authors = list(Post.objects.order_by().values_list(
+            'author_id', flat=True
+        ).distinct()[:SAMPLE_SIZE])
+        if not posts:
+            raise CommandError('База пуста: сначала запустите seed_yatube')
+        self.options = options
+        self.arguments = (posts, authors)
+        profiles = (('tuned', 'baseline') if options['profile'] == 'both'
+                    else (options['profile'],))
+        modes = (('threads', 'processes') if options['mode'] == 'both'
+                 else (options['mode'],))
+        directory = tempfile.mkdtemp()
+        runs = {}
+        try:
+            for profile in profiles:
+                for mode in modes:
+                    # Каждому прогону свежая копия: режим журнала живёт
+                    # в самом файле базы.
+                    path = os.path.join(directory, f'{profile}-{mode}.db')
+                    self.prepare(path, profile)
+                    run = runs[f'{profile}/{mode}'] = self.run(mode)
+                    self.stderr.write(self.summary(profile, mode, run))
+        finally:
+            connections.databases.pop(ALIAS, None)
+            shutil.rmtree(directory, ignore_errors=True)
+        report = {
+            'meta': {
+                'readers': options['readers'],
+                'writers': options['writers'],
+                'duration': options['duration'],
+                'burst': options['burst'],
+                'pause': options['pause'],
+                'posts': Post.objects.count(),
+                'tuned': settings.SQLITE_PRAGMAS,
+                'baseline': BASELINE_PRAGMAS,
+            },
+            'runs': runs,
+        }
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as target:
+                target.write(text)
+        else:
+            self.stdout.write(text)
+
+    def prepare(self, path, profile):
+        if connection.in_atomic_block:
+            # backup() ждал бы, пока своя же транзакция не закончится.
+            raise CommandError('Нельзя копировать базу внутри транзакции')
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            connection.connection.backup(target)
+        finally:
+            target.close()
+        connections.databases[ALIAS] = {
+            **connection.settings_dict,
+            'NAME': path,
+            'PRAGMAS': BASELINE_PRAGMAS if profile == 'baseline' else None,
+        }
+
+    def run(self, mode):
+        options = self.options
+        posts, authors = self.arguments
+        duration = options['duration']
+        if mode == 'processes':
+            # Открытые соединения не должны достаться дочерним процессам.
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            bursting = context.Value('i', 0)
+            executor = ProcessPoolExecutor(
+                options['readers'] + options['writers'], mp_context=context,
+                initializer=_share, initargs=(bursting,)
+            )
+        else:
+            _share(multiprocessing.Value('i', 0))
+            executor = ThreadPoolExecutor(
+                options['readers'] + options['writers']
+            )
+        with executor:
+            readers = [
+                executor.submit(read_worker, duration, posts,
+                                options['seed'] + index)
+                for index in range(options['readers'])
+            ]
+            writers = [
+                executor.submit(write_worker, duration, posts, authors,
+                                options['burst'], options['pause'],
+                                options['seed'] + 1000 + index)
+                for index in range(options['writers'])
+            ]
+            reads = [future.result() for future in readers]
+            writes = [future.result() for future in writers]
+        return self.aggregate(reads, writes, duration)
+
+    @staticmethod
+    def aggregate(reads, writes, duration):
+        read_latencies = sorted(latency for result in reads
+                                for latency in result['latencies'])
+        write_latencies = sorted(latency for result in writes
+                                 for latency in result['latencies'])
+        # Каждый читатель занят всё время, так что его скорость - число
+        # чтений на время, которое он на них потратил.
+        rates = {
+            bucket: sum(_rate(*result['totals'][bucket]) or 0
+                        for result in reads)
+            for bucket in ('quiet', 'bursting')
+        }
+        return {
+            'reads': len(read_latencies),
+            'reads_per_second': _rate(len(read_latencies), duration),
+            'reads_per_second_quiet': round(rates['quiet'], 1),
+            'reads_per_second_bursting': round(rates['bursting'], 1),
+            'read_p50_ms': _ms(read_latencies, 50),
+            'read_p99_ms': _ms(read_latencies, 99),
+            'read_errors': sum(result['errors'] for result in reads),
+            'writes': len(write_latencies),
+            'writes_per_second': _rate(len(write_latencies), duration),
+            'write_p50_ms': _ms(write_latencies, 50),
+            'write_p99_ms': _ms(write_latencies, 99),
+            'locked_errors': sum(result['errors'] for result in writes),
+        }
+
+    @staticmethod
+    def summary(profile, mode, run):
+        return (f'{profile}/{mode}: чтений {run["reads_per_second"]}/с, '
+                f'во время записи {run["reads_per_second_bursting"]}/с, '
+                f'записей {run["writes_per_second"]}/с, '
+                f'"database is locked": '
+                f'{run["read_errors"] + run["locked_errors"]}')
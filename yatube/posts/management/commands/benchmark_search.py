@@ -0,0 +1,100 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+
+from core import page_cache
+from posts import search
+from posts.counters import reconcile
+from posts.models import Post
+from yatube.settings import QUANTITY_POST
+
+User = get_user_model()
+
+WORDS = (
+    'котик', 'погода', 'дождь', 'утро', 'город', 'река', 'лес', 'море',
+    'книга', 'музыка', 'кофе', 'работа', 'отпуск', 'поезд', 'дорога',
+    'друзья', 'праздник', 'снег', 'солнце', 'вечер', 'новости', 'кино',
+    'фотография', 'прогулка', 'парк', 'выходные', 'футбол', 'рецепт',
+    'пирог', 'чай', 'осень', 'весна', 'лето', 'зима', 'школа', 'проект',
+    'код', 'сервер', 'база', 'запрос', 'индекс', 'поиск', 'страница',
+)
+
+
+def fake_text(rng, words=30):
+    # Частота слов убывает по Ципфу, как в живом тексте.
+    weights = [1 / rank for rank in range(1, len(WORDS) + 1)]
+    return ' '.join(rng.choices(WORDS, weights, k=words)).capitalize()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает поиск через FTS5 с LIKE по тексту постов, '
+            'при необходимости досоздавая посты')
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*',
+                            default=['котик', 'индекс', 'поезд дорога'])
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Досоздать посты, пока их не станет столько'
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options['seed'], options['batch_size'])
+        if not search.available():
+            self.stderr.write('FTS5 доступен только на SQLite')
+            return
+        self.stdout.write(f'Постов: {Post.objects.count()}')
+        for query in options['queries']:
+            like = self.measure(self.like_page, query, options['repeat'])
+            fts = self.measure(self.fts_page, query, options['repeat'])
+            self.stdout.write(
+                f'{query!r}: LIKE {like:.1f} мс, FTS5 {fts:.1f} мс, '
+                f'быстрее в {like / max(fts, 0.001):.1f} раз'
+            )
+
+    def seed(self, total, batch_size):
+        author, _ = User.objects.get_or_create(username='benchmark')
+        rng = random.Random(total)
+        missing = total - Post.objects.count()
+        while missing > 0:
+            size = min(batch_size, missing)
+            Post.objects.bulk_create(
+                Post(author=author, text=fake_text(rng))
+                for _ in range(size)
+            )
+            missing -= size
+            self.stdout.write(f'Осталось создать: {missing}')
+        # bulk_create обходит сигналы: чиним счётчики и сбрасываем ленты.
+        reconcile()
+        page_cache.purge('feed:index', f'author:{author.pk}')
+
+    @staticmethod
+    def like_page(query):
+        return Command.first_page(search.LikeSearchResults(query))
+
+    @staticmethod
+    def fts_page(query):
+        return Command.first_page(search.SearchResults(query))
+
+    @staticmethod
+    def first_page(results):
+        page = Paginator(results, QUANTITY_POST).get_page(1)
+        return page.paginator.count, list(page)
+
+    @staticmethod
+    def measure(run, query, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run(query)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,281 @@
+import json
+import random
+import statistics
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+import requests
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from posts.models import Group, Post, UserCounters
+from posts.urls import app_name, urlpatterns
+
+User = get_user_model()
+
+# Эти адреса меняют данные даже на GET.
+SKIP = frozenset(('add_comment', 'profile_follow', 'profile_unfollow',
+                  'post_delete'))
+
+# GET-параметры, без которых адрес ничего не делает.
+QUERY_PARAMS = {'search': ('q',)}
+
+SAMPLE_SIZE = 200
+
+
+class QueryCounter:
+    """execute_wrapper, который считает запросы и прочитанные строки."""
+
+    def __init__(self):
+        self.queries = self.rows = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        result = execute(sql, params, many, context)
+        # Строки читаются уже после execute: подменяем курсор обёрткой,
+        # которая считает всё, что из него выбрали.
+        wrapper = context['cursor']
+        wrapper.cursor = RowCountingCursor(wrapper.cursor, self)
+        return result
+
+
+class RowCountingCursor:
+    def __init__(self, cursor, counter):
+        self._cursor = cursor
+        self._counter = counter
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._counter.rows += 1
+            yield row
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._counter.rows += 1
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._cursor.fetchmany(*args)
+        self._counter.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._counter.rows += len(rows)
+        return rows
+
+
+def percentile(timings, share):
+    if len(timings) < 2:
+        return timings[0] if timings else None
+    return statistics.quantiles(timings, n=100, method='inclusive')[
+        share - 1
+    ]
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет все адреса posts/urls.py и пишет в JSON задержки '
+            'p50/p95/p99, число SQL-запросов и прочитанных строк')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Сколько запросов на каждый адрес')
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--wsgi',
+            action='store_true',
+            help='Ходить по HTTP в локальный WSGI-сервер, а не test Client'
+        )
+        parser.add_argument(
+            '--user',
+            help='От чьего имени ходить, по умолчанию самый активный '
+                 'подписчик'
+        )
+        parser.add_argument('--output', help='Куда записать JSON')
+        parser.add_argument('--compare', help='JSON прошлого прогона')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.samples = self.sample_arguments()
+        user = self.pick_user(options['user'])
+        self.counter = QueryCounter()
+        fetch = self.http_fetch if options['wsgi'] else self.client_fetch
+        self.client = Client()
+        if user is not None:
+            self.client.force_login(user)
+        self.server = None
+        if options['wsgi']:
+            self.start_server()
+        try:
+            views = {}
+            for name, pattern in self.patterns():
+                for _ in range(options['warmup']):
+                    fetch(self.url(name, pattern))
+                views[f'{app_name}:{name}'] = self.measure(
+                    fetch, name, pattern, options['requests']
+                )
+        finally:
+            if self.server is not None:
+                self.server.shutdown()
+        report = {
+            'meta': {
+                'mode': 'wsgi' if options['wsgi'] else 'client',
+                'requests': options['requests'],
+                'user': user and user.username,
+                'vendor': connection.vendor,
+                'posts': Post.objects.count(),
+                'users': User.objects.count(),
+                'started': datetime.now(timezone.utc).isoformat(),
+            },
+            'views': views,
+        }
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as target:
+                target.write(text)
+        else:
+            self.stdout.write(text)
+        if options['compare']:
+            self.compare(options['compare'], views)
+
+    # Подготовка.
+
+    def sample_arguments(self):
+        posts = list(Post.objects.order_by('-pub_date', '-id').values_list(
+            'pk', flat=True
+        )[:SAMPLE_SIZE])
+        if not posts:
+            raise CommandError('База пуста: сначала запустите seed_yatube')
+        groups = list(Group.objects.order_by('-posts_count').values_list(
+            'slug', flat=True
+        )[:SAMPLE_SIZE])
+        authors = list(UserCounters.objects.order_by(
+            '-followers_count'
+        ).values_list('user__username', flat=True)[:SAMPLE_SIZE])
+        words = Post.objects.filter(pk__in=posts[:20]).values_list(
+            'text', flat=True
+        )
+        return {
+            'q': [word for text in words for word in text.split()[:3]],
+            'post_id': posts,
+            'slug': groups,
+            'username': authors or list(
+                User.objects.values_list('username', flat=True)[:1]
+            ),
+        }
+
+    @staticmethod
+    def pick_user(username):
+        if username:
+            return User.objects.get(username=username)
+        counters = UserCounters.objects.select_related('user').order_by(
+            '-following_count'
+        ).first()
+        return counters and counters.user
+
+    @staticmethod
+    def patterns():
+        for pattern in urlpatterns:
+            if pattern.name not in SKIP:
+                yield pattern.name, pattern
+
+    def url(self, name, pattern):
+        kwargs = {
+            key: self.rng.choice(self.samples[key])
+            for key in pattern.pattern.converters
+        }
+        url = reverse(f'{app_name}:{name}', kwargs=kwargs)
+        if name in QUERY_PARAMS:
+            url += '?' + urlencode({
+                param: self.rng.choice(self.samples[param])
+                for param in QUERY_PARAMS[name]
+            })
+        return url
+
+    def start_server(self):
+        app = WSGIHandler()
+        counter = self.counter
+
+        def counted(environ, start_response):
+            # Сервер обслуживает запросы в своём потоке, а у потока своё
+            # соединение с базой: счётчик ставим на него.
+            with connection.execute_wrapper(counter):
+                response = app(environ, start_response)
+                return [b''.join(response)]
+
+        self.server = make_server('127.0.0.1', 0, counted,
+                                  handler_class=QuietHandler)
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+        self.session = requests.Session()
+        self.session.cookies.update(
+            {key: morsel.value for key, morsel in self.client.cookies.items()}
+        )
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+
+    # Замеры.
+
+    def client_fetch(self, url):
+        with connection.execute_wrapper(self.counter):
+            response = self.client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return response.status_code
+
+    def http_fetch(self, url):
+        return self.session.get(self.base_url + url,
+                                allow_redirects=False).status_code
+
+    def measure(self, fetch, name, pattern, total):
+        timings, queries, rows = [], [], []
+        statuses = Counter()
+        for _ in range(total):
+            url = self.url(name, pattern)
+            self.counter.queries = self.counter.rows = 0
+            started = time.perf_counter()
+            statuses[fetch(url)] += 1
+            timings.append((time.perf_counter() - started) * 1000)
+            queries.append(self.counter.queries)
+            rows.append(self.counter.rows)
+        return {
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'p99_ms': round(percentile(timings, 99), 2),
+            'queries': statistics.median(queries),
+            'max_queries': max(queries),
+            'rows': statistics.median(rows),
+            'max_rows': max(rows),
+            'status': dict(statuses),
+        }
+
+    def compare(self, path, views):
+        with open(path, encoding='utf-8') as source:
+            baseline = json.load(source)['views']
+        for name, current in views.items():
+            old = baseline.get(name)
+            if old is None:
+                continue
+            self.stderr.write(
+                f'{name}: p50 {old["p50_ms"]} → {current["p50_ms"]} мс, '
+                f'p95 {old["p95_ms"]} → {current["p95_ms"]} мс, '
+                f'запросов {old["queries"]} → {current["queries"]}, '
+                f'строк {old["rows"]} → {current["rows"]}'
+            )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts.feed import BATCH_SIZE, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Заново собирает ленты подписок из Follow и Post'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Сколько записей ленты вставлять за раз'
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild(options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Ленты пересобраны, лент: {total}')
+        )
@@ -0,0 +1,222 @@
+import itertools
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from core import page_cache
+from posts import counters
+from posts.models import Comment, FeedEntry, Follow, Group, Post
+
+User = get_user_model()
+
+# Сколько готовых фраз Faker заготовить: генерировать текст на каждый
+# пост слишком долго для миллионов строк.
+PHRASES = 5000
+
+
+def zipf_weights(size, exponent):
+    """Накопленные веса для rng.choices: ранг i выбирается ~ 1/i^s."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)
+    ))
+
+
+class Command(BaseCommand):
+    help = ('Быстро заполняет базу правдоподобными данными для нагрузочных '
+            'тестов: пользователи, группы, посты, комментарии и подписки '
+            'со степенным распределением популярности')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--follows',
+            type=int,
+            default=20,
+            help='Среднее число подписок на пользователя'
+        )
+        parser.add_argument(
+            '--exponent',
+            type=float,
+            default=1.1,
+            help='Показатель степенного закона популярности авторов'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='За сколько дней распределить даты постов'
+        )
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--feed-depth',
+            type=int,
+            default=500,
+            help='Сколько последних постов положить в ленту подписок '
+                 'каждого пользователя; 0 - не собирать ленты'
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        self.phrases = [self.fake.sentence(nb_words=12)
+                        for _ in range(PHRASES)]
+        started = time.perf_counter()
+        users = self.step('пользователи', self.seed_users,
+                          options['users'])
+        groups = self.step('группы', self.seed_groups, options['groups'])
+        # Популярность авторов одна и для постов, и для подписок:
+        # кто много пишет, на того и подписываются.
+        popular = zipf_weights(len(users), options['exponent'])
+        posts = self.step('посты', self.seed_posts, options['posts'],
+                          users, popular, groups, options['days'])
+        self.step('комментарии', self.seed_comments,
+                  options['comments'], users, posts)
+        self.step('подписки', self.seed_follows, options['follows'],
+                  users, popular)
+        if options['feed_depth']:
+            self.step('ленты', self.seed_feeds, users,
+                      options['feed_depth'])
+        self.step('счётчики', counters.reconcile)
+        page_cache.purge('feed:index', *(f'group:{pk}' for pk in groups))
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - started:.0f} с'
+        ))
+
+    def step(self, title, function, *args):
+        started = time.perf_counter()
+        result = function(*args)
+        self.stdout.write(
+            f'{title}: {time.perf_counter() - started:.1f} с'
+        )
+        return result
+
+    def text(self, sentences):
+        return ' '.join(self.rng.choices(self.phrases, k=sentences))
+
+    def bulk(self, model, objects, date_field=None):
+        """bulk_create пачками, каждая в своей транзакции."""
+        iterator = iter(objects)
+        while True:
+            chunk = list(itertools.islice(iterator, self.batch_size))
+            if not chunk:
+                return
+            dates = []
+            if date_field:
+                dates = [getattr(obj, date_field) for obj in chunk]
+            with transaction.atomic():
+                model.objects.bulk_create(chunk, ignore_conflicts=True)
+                if dates:
+                    # auto_now_add при вставке ставит текущее время:
+                    # возвращаем сгенерированные даты.
+                    for obj, date in zip(chunk, dates):
+                        setattr(obj, date_field, date)
+                    model.objects.bulk_update(chunk, [date_field])
+
+    @staticmethod
+    def base(model):
+        return model.objects.aggregate(top=Max('pk'))['top'] or 0
+
+    def seed_users(self, total):
+        base = self.base(User)
+        # Хеш пароля один на всех: make_password на каждого занял бы часы.
+        password = make_password(None)
+        self.bulk(User, (
+            User(pk=base + i, username=f'{self.fake.user_name()}_{base + i}',
+                 first_name=self.fake.first_name(),
+                 last_name=self.fake.last_name(), password=password)
+            for i in range(1, total + 1)
+        ))
+        return list(range(base + 1, base + total + 1))
+
+    def seed_groups(self, total):
+        base = self.base(Group)
+        self.bulk(Group, (
+            Group(pk=base + i, title=self.fake.catch_phrase()[:200],
+                  slug=f'group-{base + i}', description=self.text(2))
+            for i in range(1, total + 1)
+        ))
+        return list(range(base + 1, base + total + 1))
+
+    def seed_posts(self, total, users, popular, groups, days):
+        base = self.base(Post)
+        start = timezone.now() - timedelta(days=days)
+        step = timedelta(days=days) / max(total, 1)
+        self.post_date = lambda pk: start + step * (pk - base)
+
+        def posts():
+            for pk in range(base + 1, base + total + 1):
+                author = self.rng.choices(users, cum_weights=popular)[0]
+                group = (self.rng.choice(groups)
+                         if groups and self.rng.random() < 0.5 else None)
+                yield Post(pk=pk, author_id=author, group_id=group,
+                           text=self.text(self.rng.randint(1, 8)),
+                           pub_date=self.post_date(pk))
+        self.bulk(Post, posts(), 'pub_date')
+        return range(base + 1, base + total + 1)
+
+    def seed_comments(self, total, users, posts):
+        if not posts:
+            return
+        base = self.base(Comment)
+        # Свежие посты обсуждают чаще старых.
+        recent = zipf_weights(len(posts), 0.8)
+        newest_first = posts[::-1]
+        now = timezone.now()
+
+        def comments():
+            for pk in range(base + 1, base + total + 1):
+                post = self.rng.choices(newest_first, cum_weights=recent)[0]
+                published = self.post_date(post)
+                yield Comment(
+                    pk=pk, post_id=post, author_id=self.rng.choice(users),
+                    text=self.text(1),
+                    created=published + (now - published) * self.rng.random()
+                )
+        self.bulk(Comment, comments(), 'created')
+
+    def seed_follows(self, average, users, popular):
+        def follows():
+            for user in users:
+                wanted = min(int(self.rng.expovariate(1 / average)),
+                             len(users) - 1)
+                authors = set(self.rng.choices(users, cum_weights=popular,
+                                               k=wanted))
+                authors.discard(user)
+                for author in authors:
+                    yield Follow(user_id=user, author_id=author)
+        self.bulk(Follow, follows())
+
+    def seed_feeds(self, users, depth):
+        # Полный rebuild_feeds при степенном графе дал бы каждому почти
+        # все посты популярных авторов: ограничиваем ленту свежими.
+        follows = Follow.objects.filter(
+            user_id__in=users
+        ).order_by('user_id').values_list('user_id', 'author_id')
+        grouped = itertools.groupby(follows.iterator(),
+                                    key=lambda row: row[0])
+
+        def entries():
+            for user, rows in grouped:
+                posts = Post.objects.filter(
+                    author_id__in=[author for _, author in rows]
+                ).order_by('-pub_date', '-id').values_list(
+                    'pk', 'pub_date'
+                )[:depth]
+                for pk, pub_date in posts:
+                    yield FeedEntry(user_id=user, post_id=pk,
+                                    pub_date=pub_date)
+        self.bulk(FeedEntry, entries())
@@ -0,0 +1,50 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post
+from posts.signals import purge_post_caches
+
+
+class Command(BaseCommand):
+    help = 'Заранее создаёт миниатюры всех размеров для картинок постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Сколько процессов создают миниатюры параллельно'
+        )
+
+    def handle(self, *args, **options):
+        posts = {}
+        for post in Post.objects.exclude(image='').only(
+            'pk', 'author_id', 'group_id', 'image'
+        ):
+            posts.setdefault(post.image.name, []).append(post)
+        # Дочерние процессы не должны делить соединение с родителем.
+        connections.close_all()
+        failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers'],
+                                 initializer=django.setup) as pool:
+            futures = {
+                pool.submit(thumbnails.generate, name): name
+                for name in posts
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'{futures[future]}: {error}')
+        for group in posts.values():
+            for post in group:
+                purge_post_caches(post)
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры готовы: картинок {len(posts)}, ошибок {failed}'
+        ))
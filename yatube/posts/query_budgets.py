@@ -0,0 +1,26 @@
+"""Сколько SQL-запросов может сделать каждый адрес posts (см.
+core.query_budget). Считается с пустым кэшем, от имени подписчика."""
+from core.query_budget import Budget
+
+BUDGETS = {
+    'posts:index': Budget(4),
+    'posts:group': Budget(6),
+    'posts:profile': Budget(8),
+    'posts:post_detail': Budget(6),
+    'posts:post_edit': Budget(4, login='author'),
+    'posts:add_comment': Budget(3),
+    'posts:post_create': Budget(3),
+    'posts:follow_index': Budget(3),
+    'posts:search': Budget(2),
+    'posts:search?q': Budget(5, view='posts:search', data={'q': 'пост'}),
+    'posts:export': Budget(5),
+    'posts:profile_follow': Budget(5),
+    'posts:profile_unfollow': Budget(8),
+    'posts:post_delete': Budget(7, setup='add_spare_post',
+                                kwargs={'post_id': 'spare_post.pk'}),
+    'posts:api_index': Budget(1, login=None),
+    'posts:api_group': Budget(2, login=None),
+    'posts:api_profile': Budget(2, login=None),
+    'posts:api_follow_index': Budget(3),
+    'posts:api_post_detail': Budget(2, login=None),
+}
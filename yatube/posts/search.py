@@ -0,0 +1,212 @@
+"""Полнотекстовый поиск по постам.
+
+На SQLite текст постов индексируется виртуальной таблицей FTS5 с
+внешним содержимым: её держат в актуальном виде триггеры на posts_post,
+поэтому индекс не отстаёт и при bulk_create или update в обход
+сигналов. Результаты ранжируются по bm25 и отдаются с подсвеченными
+фрагментами. На других базах и на SQLite, собранном без FTS5, поиск
+откатывается к LIKE.
+"""
+import re
+import sqlite3
+from functools import lru_cache
+
+from django.db import connection, connections
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+
+from posts.models import Post
+
+FTS_TABLE = 'posts_post_fts'
+
+# Маркеры подсветки, которых не бывает в тексте: фрагмент сначала
+# экранируется, а уже потом маркеры меняются на <mark>.
+MARK_START, MARK_END = '\x02', '\x03'
+
+SNIPPET_TOKENS = 24
+
+TERM_RE = re.compile(r'\w+')
+
+SCHEMA = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text,
+        content='posts_post',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+    AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+)
+
+
+@lru_cache(maxsize=None)
+def fts5_compiled():
+    """Пробует создать таблицу FTS5 в отдельной базе в памяти."""
+    probe = sqlite3.connect(':memory:')
+    try:
+        probe.execute('CREATE VIRTUAL TABLE probe USING fts5(text)')
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        probe.close()
+    return True
+
+
+def available(using=connection):
+    return using.vendor == 'sqlite' and fts5_compiled()
+
+
+def install(using=connection):
+    """Создаёт таблицу и триггеры, если их нет, и переиндексирует посты.
+
+    Пересборка таблицы posts_post в миграциях SQLite удаляет её
+    триггеры, поэтому install() вызывается и после каждого migrate.
+    """
+    if (not available(using)
+            or Post._meta.db_table not in using.introspection.table_names()):
+        return False
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master "
+            "WHERE type = 'trigger' AND name LIKE %s",
+            [f'{FTS_TABLE}_%']
+        )
+        if cursor.fetchone()[0] == len(SCHEMA) - 1:
+            return False
+        for statement in SCHEMA:
+            cursor.execute(statement)
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+    return True
+
+
+def install_after_migrate(using, **kwargs):
+    install(connections[using])
+
+
+def uninstall(using=connection):
+    if not available(using):
+        return
+    with using.cursor() as cursor:
+        for suffix in ('insert', 'delete', 'update'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def match_expression(query):
+    """Запрос пользователя как выражение FTS5: все слова, каждое в кавычках.
+
+    Кавычки не дают словам вроде NOT или NEAR стать операторами.
+    """
+    terms = TERM_RE.findall(query or '')
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def filter_matching(queryset, query):
+    """Оставляет в выборке постов только подходящие под запрос."""
+    # RawSQL внутри pk__in SQLite понял бы как скалярный подзапрос
+    # из двойных скобок, поэтому условие дописывается через extra().
+    return queryset.extra(
+        where=[f'{Post._meta.db_table}.id IN (SELECT rowid FROM {FTS_TABLE} '
+               f'WHERE {FTS_TABLE} MATCH %s)'],
+        params=[match_expression(query)]
+    )
+
+
+class SearchResults:
+    """Ленивая выборка для Paginator: count() и срезы по рангу bm25."""
+
+    def __init__(self, query):
+        self.expression = match_expression(query)
+
+    def count(self):
+        if not self.expression:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s',
+                [self.expression]
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError('SearchResults supports only slices')
+        start = index.start or 0
+        if not self.expression or index.stop is None:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, snippet({FTS_TABLE}, 0, %s, %s, %s, %s) '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}), rowid DESC LIMIT %s OFFSET %s',
+                [MARK_START, MARK_END, '…', SNIPPET_TOKENS,
+                 self.expression, index.stop - start, start]
+            )
+            snippets = dict(cursor.fetchall())
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            list(snippets)
+        )
+        results = []
+        for pk, snippet in snippets.items():
+            if pk in posts:
+                posts[pk].snippet = highlight(snippet)
+                results.append(posts[pk])
+        return results
+
+
+class LikeSearchResults:
+    """Поиск подстрокой для баз без FTS5, новые посты первыми."""
+
+    def __init__(self, query):
+        self.terms = TERM_RE.findall(query or '')
+        self.queryset = Post.objects.none()
+        if self.terms:
+            self.queryset = Post.objects.select_related('author', 'group')
+            for term in self.terms:
+                self.queryset = self.queryset.filter(text__icontains=term)
+
+    def count(self):
+        return self.queryset.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        posts = list(self.queryset[index])
+        for post in posts:
+            post.snippet = Truncator(post.text).words(SNIPPET_TOKENS)
+        return posts
+
+
+def search(query):
+    if available():
+        return SearchResults(query)
+    return LikeSearchResults(query)
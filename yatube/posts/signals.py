@@ -0,0 +1,139 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core import page_cache
+from posts import cards, counters, feed, thumbnails
+from posts.forms import GROUP_CHOICES_KEY
+from posts.models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+CARD_USER_FIELDS = frozenset(('username', 'first_name', 'last_name'))
+
+# raw=True - запись из фикстуры, как у loaddata: ленты, счётчики и кэши
+# для таких записей пересобирают целиком (rebuild_feeds,
+# reconcile_counters), а не по одной.
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_drop(sender, instance, **kwargs):
+    feed.drop(instance.user_id, instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def post_remember_saved(sender, instance, **kwargs):
+    instance._saved_group_id = instance._saved_image = None
+    if not instance._state.adding:
+        instance._saved_group_id, instance._saved_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image'
+            ).first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_thumbnails(sender, instance, created, raw=False, **kwargs):
+    if not raw and instance.image.name != instance._saved_image:
+        thumbnails.enqueue(instance)
+
+
+@receiver(post_save, sender=User)
+def user_counters(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserCounters.objects.create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def post_count(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.bump_user(instance.author_id, 'posts_count', 1)
+        counters.bump_group(instance.group_id, 1)
+    elif instance._saved_group_id != instance.group_id:
+        counters.bump_group(instance._saved_group_id, -1)
+        counters.bump_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_uncount(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'posts_count', -1)
+    counters.bump_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_uncount(sender, instance, **kwargs):
+    counters.bump_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_user(instance.user_id, 'following_count', 1)
+        counters.bump_user(instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_uncount(sender, instance, **kwargs):
+    counters.bump_user(instance.user_id, 'following_count', -1)
+    counters.bump_user(instance.author_id, 'followers_count', -1)
+
+
+def purge_post_caches(post):
+    """Сбрасывает карточку поста и все страницы, где он выводится."""
+    cards.bump('post', post.pk)
+    tags = {'feed:index', f'author:{post.author_id}'}
+    for group_id in (post.group_id, getattr(post, '_saved_group_id', None)):
+        if group_id is not None:
+            tags.add(f'group:{group_id}')
+    page_cache.purge(*tags)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_caches_purge(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    purge_post_caches(instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_caches_purge(sender, instance, **kwargs):
+    cards.bump('group', instance.pk)
+    cache.delete(GROUP_CHOICES_KEY)
+    page_cache.purge(f'group:{instance.pk}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_page_purge(sender, instance, **kwargs):
+    page_cache.purge(f'author:{instance.user_id}',
+                     f'author:{instance.author_id}')
+
+
+@receiver(post_save, sender=User)
+def user_caches_purge(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or CARD_USER_FIELDS & set(update_fields):
+        cards.bump('user', instance.pk)
+        page_cache.purge(f'author:{instance.pk}')
@@ -0,0 +1,63 @@
+import logging
+
+from django import template
+from django.conf import settings
+
+from posts import thumbnails
+
+logger = logging.getLogger(__name__)
+
+register = template.Library()
+
+FALLBACK_WIDTH = 960
+
+
+def _srcset(files):
+    files = sorted(files, key=lambda file: file.width)
+    return ', '.join(f'{file.url} {file.width}w' for file in files)
+
+
+def _ready_by_format(post):
+    prefetched = getattr(post, 'ready_thumbnails', None)
+    if prefetched is None:
+        prefetched = thumbnails.prefetch([post])[0].ready_thumbnails
+    ready = {}
+    for alias in thumbnails.aliases():
+        thumbnail = prefetched.get(alias)
+        if thumbnail is not None:
+            ready.setdefault(thumbnails.image_format(alias), []).append(
+                thumbnail
+            )
+    return ready
+
+
+@register.inclusion_tag('includes/post_picture.html')
+def post_picture(post):
+    """Картинка поста с вариантами для srcset или заглушка, пока их нет.
+
+    Как и тег thumbnail из sorl, ошибки с файлом не роняют страницу.
+    """
+    context = {'post': post, 'sizes': settings.POST_IMAGE_SIZES}
+    if not post.image:
+        return context
+    try:
+        ready = _ready_by_format(post)
+    except Exception:
+        logger.exception('Миниатюры для поста %s недоступны', post.pk)
+        return context
+    if not ready:
+        return context
+    # В <img> идёт последний из готовых форматов, остальные - в <source>.
+    *sources, (_, files) = ready.items()
+    fitting = [file for file in files if file.width <= FALLBACK_WIDTH]
+    context.update(
+        image=(max(fitting, key=lambda file: file.width) if fitting
+               else min(files, key=lambda file: file.width)),
+        srcset=_srcset(files),
+        sources=[
+            {'type': f'image/{image_format.lower()}',
+             'srcset': _srcset(source_files)}
+            for image_format, source_files in sources
+        ],
+    )
+    return context
@@ -0,0 +1,86 @@
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Post, Group, Comment, Follow
+
+User = get_user_model()
+
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.groups = [
+            Group.objects.create(title=f'Группа {i}', slug=f'group_{i}',
+                                 description='Описание')
+            for i in range(10)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(AdminChangelistTest.admin)
+
+    def add_rows(self, total):
+        users = [User.objects.create_user(username=f'user_{total}_{i}')
+                 for i in range(total)]
+        for i, user in enumerate(users):
+            post = Post.objects.create(
+                author=user, text='Пост',
+                group=AdminChangelistTest.groups[i % 10]
+            )
+            Comment.objects.create(post=post, author=user, text='Текст')
+            Follow.objects.create(user=user, author=AdminChangelistTest.admin)
+
+    def test_changelist_queries_do_not_grow(self):
+        """Число запросов changelist не зависит от числа строк"""
+        urls = (
+            reverse('admin:posts_post_changelist'),
+            reverse('admin:posts_comment_changelist'),
+            reverse('admin:posts_follow_changelist'),
+        )
+        budgets = {}
+        for total in (2, 20):
+            self.add_rows(total)
+            for url in urls:
+                self.client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                budgets.setdefault(url, []).append(len(queries))
+        for url, (small, large) in budgets.items():
+            with self.subTest(url=url):
+                self.assertEqual(small, large)
+
+    def test_group_choices_cached(self):
+        """Список групп строится один раз и сбрасывается при их изменении"""
+        self.add_rows(5)
+        url = reverse('admin:posts_post_changelist')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'FROM "posts_group"' in query['sql']])
+        Group.objects.create(title='Новая группа', slug='new',
+                             description='Описание')
+        self.assertContains(self.client.get(url), 'Новая группа')
+
+    def test_estimated_count(self):
+        """Без фильтров большая таблица не считается точным COUNT(*)"""
+        self.add_rows(3)
+        url = reverse('admin:posts_post_changelist')
+        with mock.patch('core.paginator.EXACT_COUNT_BELOW', 1):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'COUNT(*)' in query['sql']])
+        self.assertGreaterEqual(response.context['cl'].result_count, 3)
+        response = self.client.get(url, {'q': 'Пост'})
+        self.assertEqual(response.context['cl'].result_count, 3)
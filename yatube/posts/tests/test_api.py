@@ -0,0 +1,140 @@
+import json
+from datetime import timedelta
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+from yatube.settings import QUANTITY_POST
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Коты', slug='cats',
+                                         description='Коты')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {i}',
+                                group=None if i % 2 else cls.group)
+            for i in range(QUANTITY_POST + 3)
+        ]
+        cls.post = cls.posts[-1]
+        cls.comment = Comment.objects.create(post=cls.post,
+                                             author=cls.reader,
+                                             text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(ApiTest.reader)
+
+    def feeds(self):
+        return (
+            reverse('posts:api_index'),
+            reverse('posts:api_group', kwargs={'slug': 'cats'}),
+            reverse('posts:api_profile', kwargs={'username': 'auth'}),
+            reverse('posts:api_follow_index'),
+        )
+
+    def test_feeds(self):
+        """Ленты отдают компактный JSON страницами по курсору"""
+        for url in self.feeds():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response['Content-Type'],
+                                 'application/json')
+                self.assertNotIn(b', ', response.content)
+                data = response.json()
+                self.assertEqual(data['results'][0]['id'],
+                                 ApiTest.post.pk)
+                self.assertIsNone(data['previous'])
+                if data['next']:
+                    rest = self.client.get(url, {'after': data['next']})
+                    self.assertNotIn(
+                        data['results'][-1],
+                        rest.json()['results']
+                    )
+
+    def test_post_serialization(self):
+        data = self.client.get(reverse('posts:api_index')).json()
+        self.assertEqual(data['results'][0], {
+            'id': ApiTest.post.pk,
+            'author': 'auth',
+            'group': 'cats',
+            'text': ApiTest.post.text,
+            'pub_date': ApiTest.post.pub_date.isoformat(),
+            'image': None,
+            'comments': 1,
+        })
+
+    def test_since_id(self):
+        """since_id отдаёт только новые посты, а без них - пустой 204"""
+        for url in self.feeds():
+            with self.subTest(url=url):
+                response = self.client.get(url,
+                                           {'since_id': ApiTest.post.pk})
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NO_CONTENT)
+                self.assertEqual(response.content, b'')
+        since = ApiTest.posts[-3].pk
+        data = self.client.get(reverse('posts:api_follow_index'),
+                               {'since_id': since}).json()
+        self.assertEqual([post['id'] for post in data['results']],
+                         [ApiTest.posts[-1].pk, ApiTest.posts[-2].pk])
+
+    def test_since_id_follows_feed_order(self):
+        """В ленте подписок since_id сравнивается по тому же ключу, по
+        которому лента сортирована, даже если он не совпадает с id поста"""
+        author = User.objects.create_user(username='late')
+        first, second = (Post.objects.create(author=author, text=text)
+                         for text in ('Первый', 'Второй'))
+        Post.objects.filter(author=author).update(
+            pub_date=ApiTest.post.pub_date + timedelta(days=1)
+        )
+        # Досылка идёт от новых постов к старым: запись второго поста
+        # в ленте получает меньший id, чем запись первого.
+        Follow.objects.create(user=ApiTest.reader, author=author)
+        url = reverse('posts:api_follow_index')
+        data = self.client.get(url).json()
+        self.assertEqual([post['id'] for post in data['results'][:2]],
+                         [first.pk, second.pk])
+        response = self.client.get(url, {'since_id': first.pk})
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        data = self.client.get(url, {'since_id': second.pk}).json()
+        self.assertEqual([post['id'] for post in data['results']],
+                         [first.pk])
+
+    def test_since_id_check_uses_index(self):
+        url = reverse('posts:api_group', kwargs={'slug': 'cats'})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'since_id': ApiTest.post.pk})
+        check = queries.captured_queries[-1]['sql']
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + check)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('COVERING INDEX', plan)
+
+    def test_follow_requires_login(self):
+        response = Client().get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_post_detail(self):
+        url = reverse('posts:api_post_detail',
+                      kwargs={'post_id': ApiTest.post.pk})
+        data = json.loads(self.client.get(url).content)
+        self.assertEqual(data['post']['id'], ApiTest.post.pk)
+        self.assertEqual(data['comments']['results'][0]['text'],
+                         'Комментарий')
+        response = self.client.get(url, {'since_id': ApiTest.comment.pk})
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        response = self.client.get(reverse('posts:api_post_detail',
+                                           kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
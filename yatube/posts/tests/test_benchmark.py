@@ -0,0 +1,58 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from posts.models import Comment, FeedEntry, Follow, Group, Post
+from posts.urls import urlpatterns
+
+
+class BenchmarkTest(TestCase):
+    def test_seed_and_benchmark(self):
+        """seed_yatube строит данные, а benchmark_views обходит по ним
+        все безопасные адреса и отдаёт JSON с задержками и запросами"""
+        call_command('seed_yatube', '--users', '30', '--groups', '3',
+                     '--posts', '200', '--comments', '100',
+                     '--follows', '5', '--feed-depth', '20',
+                     stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(FeedEntry.objects.exists())
+        self.assertEqual(
+            sum(Post.objects.values_list('comments_count', flat=True)), 100
+        )
+        out = StringIO()
+        call_command('benchmark_views', '--requests', '3', '--warmup', '0',
+                     stdout=out)
+        views = json.loads(out.getvalue())['views']
+        self.assertEqual(len(views), len(urlpatterns) - 4)
+        index = views['posts:index']
+        self.assertEqual(index['status'], {'200': 3})
+        self.assertLessEqual(index['p50_ms'], index['p99_ms'])
+        self.assertGreater(views['posts:post_detail']['queries'], 0)
+        self.assertGreater(views['posts:api_index']['rows'], 0)
+
+
+class ContentionBenchmarkTest(TransactionTestCase):
+    # Копия базы делается через backup(), а он не видит данные открытой
+    # транзакции TestCase.
+    def test_contention(self):
+        """benchmark_contention гоняет чтения и записи на копии базы и
+        не трогает саму базу"""
+        call_command('seed_yatube', '--users', '10', '--groups', '2',
+                     '--posts', '50', '--comments', '20', '--follows', '3',
+                     '--feed-depth', '0', stdout=StringIO())
+        out = StringIO()
+        call_command('benchmark_contention', '--mode', 'threads',
+                     '--duration', '0.3', '--readers', '2', '--writers', '1',
+                     '--burst', '3', '--pause', '0.01', stdout=out,
+                     stderr=StringIO())
+        runs = json.loads(out.getvalue())['runs']
+        self.assertEqual(set(runs), {'tuned/threads', 'baseline/threads'})
+        for run in runs.values():
+            self.assertGreater(run['reads'], 0)
+            self.assertGreater(run['writes'], 0)
+            self.assertEqual(run['locked_errors'], 0)
+        self.assertEqual(Comment.objects.count(), 20)
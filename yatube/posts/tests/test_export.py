@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.http import StreamingHttpResponse
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.importer import Importer
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(title='Коты', slug='cats',
+                                         description='Коты')
+        cls.post = Post.objects.create(author=cls.user, group=cls.group,
+                                       text='Пост с "кавычками", и запятой')
+        cls.other_post = Post.objects.create(author=cls.other,
+                                             text='Чужой пост')
+        Comment.objects.create(post=cls.post, author=cls.user,
+                               text='Свой комментарий')
+        Comment.objects.create(post=cls.post, author=cls.other,
+                               text='Чужой комментарий')
+        Follow.objects.create(user=cls.user, author=cls.other)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(ExportTest.user)
+
+    def export(self, **params):
+        response = self.client.get(reverse('posts:export'), params)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return b''.join(response.streaming_content).decode()
+
+    def test_login_required(self):
+        response = Client().get(reverse('posts:export'))
+        self.assertRedirects(response, '/auth/login/?next=/export/')
+
+    def test_jsonl(self):
+        """Выгрузка содержит только записи самого пользователя"""
+        records = [json.loads(line)
+                   for line in self.export().splitlines()]
+        self.assertEqual([record['type'] for record in records],
+                         ['post', 'comment', 'follow'])
+        self.assertEqual(records[0]['group'], 'cats')
+        self.assertEqual(records[0]['text'], ExportTest.post.text)
+        self.assertEqual(records[1]['post'], ExportTest.post.pk)
+        self.assertEqual(records[2]['author'], 'other')
+
+    def test_csv(self):
+        response = self.client.get(reverse('posts:export'),
+                                   {'format': 'csv'})
+        self.assertIn('auth.csv', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(
+            b''.join(response.streaming_content).decode()
+        )))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['text'], ExportTest.post.text)
+
+    def test_unknown_format(self):
+        response = self.client.get(reverse('posts:export'),
+                                   {'format': 'xml'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_command_output_imports_back(self):
+        """Файл выгрузки читается командой импорта"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'auth.jsonl')
+        call_command('export_yatube', 'auth', '--output', path,
+                     '--chunk-size', '1')
+        Post.objects.filter(author=ExportTest.user).delete()
+        Follow.objects.all().delete()
+        stats = Importer(path, 'jsonl', log=lambda _: None).run()
+        self.assertEqual((stats['post'], stats['comment'], stats['follow']),
+                         (1, 1, 1))
+        imported = Post.objects.get(author=ExportTest.user)
+        self.assertEqual(imported.group, ExportTest.group)
+        self.assertEqual(imported.comments.get().text, 'Свой комментарий')
@@ -67,6 +67,22 @@ class PostsFormTest(TestCase):
         self.assertEqual(last_post.group, PostsFormTest.group)
         self.assertEqual(last_post.image, 'posts/small.gif')
 
+    @override_settings(UPLOAD_MAX_BYTES=16)
+    def test_form_rejects_large_upload(self):
+        """Файл больше UPLOAD_MAX_BYTES не сохраняется, форма с ошибкой"""
+        uploaded = SimpleUploadedFile(
+            name='large.gif',
+            content=b'GIF89a' + b'\x00' * 64,
+            content_type='image/gif'
+        )
+        posts_count = Post.objects.count()
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': '123', 'image': uploaded}
+        )
+        self.assertEqual(Post.objects.count(), posts_count)
+        self.assertTrue(response.context['form'].has_error('image'))
+
     def test_form_edit_post(self):
         """Валидная форма изменяет запись в Post"""
         group = Group.objects.create(
@@ -0,0 +1,208 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from posts import signals
+from posts.importer import Importer
+from posts.models import Comment, FeedEntry, Follow, Group, Post
+
+User = get_user_model()
+
+RECORDS = [
+    {'type': 'post', 'id': 'p1', 'author': 'leo', 'group': 'cats',
+     'text': 'Первый пост', 'pub_date': '2020-01-02T03:04:05+00:00'},
+    {'type': 'follow', 'user': 'ann', 'author': 'leo'},
+    {'type': 'post', 'id': 'p2', 'author': 'leo', 'text': 'Второй пост'},
+    {'type': 'comment', 'post': 'p1', 'author': 'ann', 'text': 'Ура',
+     'created': '2020-01-03T00:00:00+00:00'},
+    {'type': 'post', 'id': 'p3', 'author': 'nobody', 'text': 'Чужой'},
+    {'type': 'comment', 'post': 'p3', 'author': 'ann', 'text': 'Мимо'},
+    {'type': 'post', 'id': 'p4', 'author': 'leo', 'group': 'dogs',
+     'text': 'Без группы'},
+]
+
+
+class ImportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.leo = User.objects.create_user(username='leo')
+        cls.ann = User.objects.create_user(username='ann')
+        cls.group = Group.objects.create(title='Коты', slug='cats',
+                                         description='Коты')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, lines):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as target:
+            target.write('\n'.join(lines) + '\n')
+        return path
+
+    def jsonl(self, records):
+        return self.write('data.jsonl',
+                          [json.dumps(record) for record in records])
+
+    def test_import_jsonl(self):
+        """Импорт создаёт записи, отклоняет плохие и обновляет счётчики"""
+        path = self.jsonl(RECORDS)
+        out = StringIO()
+        call_command('import_yatube', path, '--batch-size', '3', stdout=out)
+        self.assertIn('постов 2, комментариев 1, подписок 1, отклонено 3',
+                      out.getvalue())
+        first = Post.objects.get(text='Первый пост')
+        self.assertEqual(first.group, ImportTest.group)
+        self.assertEqual(first.pub_date.year, 2020)
+        self.assertEqual(first.comments_count, 1)
+        self.assertEqual(Comment.objects.get().created.year, 2020)
+        self.assertTrue(Follow.objects.filter(user=ImportTest.ann,
+                                              author=ImportTest.leo).exists())
+        self.assertEqual(
+            FeedEntry.objects.filter(user=ImportTest.ann).count(), 2
+        )
+        self.assertEqual(
+            Group.objects.get(pk=ImportTest.group.pk).posts_count, 1
+        )
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+    def test_import_csv(self):
+        """CSV с колонками вместо полей и созданием новых авторов"""
+        path = self.write('data.csv', [
+            'type,id,author,group,text,user',
+            'post,1,kate,cats,Из CSV,',
+            'follow,,leo,,,kate',
+        ])
+        call_command('import_yatube', path, '--create-users',
+                     stdout=StringIO())
+        kate = User.objects.get(username='kate')
+        self.assertFalse(kate.has_usable_password())
+        self.assertTrue(Post.objects.filter(author=kate,
+                                            group=ImportTest.group).exists())
+        self.assertTrue(Follow.objects.filter(user=kate,
+                                              author=ImportTest.leo).exists())
+
+    def test_resume_after_failure(self):
+        """После сбоя импорт продолжается с контрольной точки без дублей"""
+        path = self.jsonl(RECORDS)
+        importer = Importer(path, 'jsonl', batch_size=3, log=lambda _: None)
+        flush = importer.flush
+        calls = []
+
+        def failing_flush(batch):
+            calls.append(batch)
+            if len(calls) == 2:
+                raise RuntimeError('сбой')
+            flush(batch)
+
+        with mock.patch.object(importer, 'flush', failing_flush):
+            with self.assertRaises(RuntimeError):
+                importer.run()
+        with open(f'{path}.checkpoint', encoding='utf-8') as source:
+            state = json.load(source)
+        self.assertNotIn('posts', state)
+        self.assertEqual(
+            os.path.getsize(f'{path}.checkpoint.posts'), state['posts_size']
+        )
+        stats = Importer(path, 'jsonl', batch_size=3,
+                         log=lambda _: None).run()
+        self.assertEqual(stats['post'], 2)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(
+            Comment.objects.get().post, Post.objects.get(text='Первый пост')
+        )
+        self.assertFalse(os.path.exists(f'{path}.checkpoint.posts'))
+
+    def test_live_posts_during_import(self):
+        """Посты с сайта во время импорта не отнимают ключи у импорта"""
+        path = self.jsonl(RECORDS)
+        importer = Importer(path, 'jsonl', batch_size=3, log=lambda _: None)
+        flush = importer.flush
+
+        def flush_after_live_post(batch):
+            Post.objects.create(author=ImportTest.ann, text='С сайта')
+            flush(batch)
+
+        with mock.patch.object(importer, 'flush', flush_after_live_post):
+            stats = importer.run()
+        self.assertEqual(stats['post'], 2)
+        self.assertEqual(Post.objects.filter(author=ImportTest.leo).count(),
+                         2)
+        comment = Comment.objects.get()
+        self.assertEqual(comment.post.text, 'Первый пост')
+        self.assertEqual(comment.post.pub_date.year, 2020)
+        self.assertEqual(
+            set(FeedEntry.objects.filter(user=ImportTest.ann).values_list(
+                'post__author', flat=True
+            )), {ImportTest.leo.pk}
+        )
+
+    def test_resume_after_lost_checkpoint(self):
+        """Пачка, записанная без контрольной точки, не дублируется"""
+        path = self.jsonl(RECORDS)
+        importer = Importer(path, 'jsonl', batch_size=3, log=lambda _: None)
+        save_checkpoint = importer.save_checkpoint
+        calls = []
+
+        def failing_save(position):
+            calls.append(position)
+            if len(calls) == 2:
+                raise OSError('диск')
+            save_checkpoint(position)
+
+        with mock.patch.object(importer, 'save_checkpoint', failing_save):
+            with self.assertRaises(OSError):
+                importer.run()
+        stats = Importer(path, 'jsonl', batch_size=3,
+                         log=lambda _: None).run()
+        self.assertEqual(stats['post'], 2)
+        self.assertEqual(stats['comment'], 1)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(
+            Post.objects.get(text='Первый пост').comments_count, 1
+        )
+
+    def test_batch_is_written_in_bulk(self):
+        """Число запросов на пачку не растёт с числом записей в ней"""
+        def queries(size):
+            Post.objects.all().delete()
+            path = self.jsonl([
+                {'type': 'post', 'id': f'p{i}', 'author': 'leo',
+                 'text': f'Пост {i}', 'pub_date': '2020-01-02T03:04:05'}
+                for i in range(size)
+            ] + [
+                {'type': 'comment', 'post': f'p{i}', 'author': 'ann',
+                 'text': 'Ура'}
+                for i in range(size)
+            ])
+            with CaptureQueriesContext(connection) as captured:
+                Importer(path, 'jsonl', batch_size=2 * size,
+                         log=lambda _: None).run()
+            return len(captured)
+
+        self.assertEqual(queries(5), queries(50))
+        post = Post.objects.get(text='Пост 7')
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.comments.get().post_id, post.pk)
+
+    def test_raw_save_skips_cache_purge(self):
+        """Запись из фикстуры не сбрасывает кэш по одному посту"""
+        post = Post(author=ImportTest.leo, text='Из фикстуры',
+                    pub_date=timezone.now())
+        with mock.patch.object(signals, 'purge_post_caches') as purge:
+            post.save_base(raw=True, force_insert=True)
+            purge.assert_not_called()
+            post.save()
+            purge.assert_called_once_with(post)
@@ -0,0 +1,103 @@
+import re
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Post, Group, Comment, Follow
+
+User = get_user_model()
+
+BAD_PLAN = re.compile(r'^SCAN (TABLE )?\S+( LEFT-JOIN)?$|USE TEMP B-TREE')
+
+
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.groups = [
+            Group.objects.create(title=f'Группа {i}', slug=f'group_{i}',
+                                 description='Описание')
+            for i in range(20)
+        ]
+        for i in range(30):
+            cls.post = Post.objects.create(author=cls.author,
+                                           text=f'Пост {i}',
+                                           group=cls.groups[i % 2])
+            Comment.objects.create(post=cls.post, author=cls.reader,
+                                   text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(QueryPlanTest.reader)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_plans_use_indexes(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        for query in queries.captured_queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            plan = self.explain(query['sql'])
+            bad = [step for step in plan if BAD_PLAN.search(step)]
+            self.assertFalse(
+                bad, f'{url}: {query["sql"]}\n' + '\n'.join(plan)
+            )
+        return response
+
+    def test_feed_query_plans(self):
+        """Запросы лент не сканируют таблицы и не сортируют во временном
+        B-дереве"""
+        feeds = (
+            reverse('posts:index'),
+            reverse('posts:group',
+                    kwargs={'slug': QueryPlanTest.groups[0].slug}),
+            reverse('posts:profile',
+                    kwargs={'username': QueryPlanTest.author.username}),
+            reverse('posts:follow_index'),
+        )
+        for url in feeds:
+            with self.subTest(url=url):
+                page_obj = self.assert_plans_use_indexes(
+                    url
+                ).context['page_obj']
+                page_obj = self.assert_plans_use_indexes(
+                    f'{url}?after={page_obj.next_cursor}'
+                ).context['page_obj']
+                self.assert_plans_use_indexes(
+                    f'{url}?before={page_obj.previous_cursor}'
+                )
+
+    def test_post_detail_query_plans(self):
+        """Запросы post_detail используют индексы"""
+        self.assert_plans_use_indexes(
+            reverse('posts:post_detail',
+                    kwargs={'post_id': QueryPlanTest.post.id})
+        )
+
+    def test_api_query_plans(self):
+        """Запросы JSON API, в том числе с since_id, используют индексы"""
+        since = Post.objects.order_by('pk')[25].pk
+        urls = (
+            reverse('posts:api_index'),
+            reverse('posts:api_group',
+                    kwargs={'slug': QueryPlanTest.groups[0].slug}),
+            reverse('posts:api_profile',
+                    kwargs={'username': QueryPlanTest.author.username}),
+            reverse('posts:api_follow_index'),
+            reverse('posts:api_post_detail',
+                    kwargs={'post_id': QueryPlanTest.post.id}),
+        )
+        for url in urls:
+            for query in ('', f'?since_id={since}'):
+                with self.subTest(url=url + query):
+                    self.assert_plans_use_indexes(url + query)
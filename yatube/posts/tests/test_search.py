@@ -0,0 +1,87 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import search
+from posts.models import Post
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.rare = Post.objects.create(
+            author=cls.user,
+            text='Утренний котик <b>спит</b> на подоконнике'
+        )
+        cls.frequent = Post.objects.create(
+            author=cls.user,
+            text='Котик, котик и ещё раз котик на подоконнике'
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост про погоду номер {i}')
+            for i in range(15)
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, query, **params):
+        return self.client.get(reverse('posts:search'),
+                               {'q': query, **params})
+
+    def test_ranked_results_with_snippets(self):
+        """Поиск находит посты по словам, чаще упомянутое выше,
+        совпадения подсвечены, а HTML из текста экранирован"""
+        page_obj = self.search('котик подоконнике').context['page_obj']
+        self.assertEqual(list(page_obj),
+                         [SearchTest.frequent, SearchTest.rare])
+        snippet = page_obj[1].snippet
+        self.assertIn('<mark>котик</mark>', snippet)
+        self.assertIn('&lt;b&gt;спит&lt;/b&gt;', snippet)
+
+    def test_index_follows_changes(self):
+        """Индекс видит bulk_create, update в обход сигналов и удаление"""
+        self.assertEqual(
+            self.search('погоду').context['page_obj'].paginator.count, 15
+        )
+        Post.objects.filter(pk=SearchTest.rare.pk).update(text='Про дождь')
+        self.assertEqual(
+            list(self.search('дождь').context['page_obj']),
+            [SearchTest.rare]
+        )
+        self.assertFalse(self.search('спит').context['page_obj'])
+        Post.objects.filter(pk=SearchTest.frequent.pk).delete()
+        self.assertFalse(self.search('котик').context['page_obj'])
+
+    def test_pagination_and_operators(self):
+        """Результаты разбиты на страницы, операторы FTS5 в запросе
+        не ломают поиск"""
+        page_obj = self.search('погоду', page=2).context['page_obj']
+        self.assertEqual(len(page_obj), 5)
+        for query in ('"', 'NOT котик', 'котик*', ''):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query).status_code, 200)
+
+    def test_admin_search(self):
+        """Поиск в админке идёт через индекс"""
+        self.client.force_login(SearchTest.admin)
+        response = self.client.get(reverse('admin:posts_post_changelist'),
+                                   {'q': 'подоконнике'})
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+    def test_fallback_without_fts5(self):
+        """Без FTS5 в SQLite поиск идёт подстрокой"""
+        with mock.patch.object(search, 'fts5_compiled', return_value=False):
+            page_obj = self.search('котик подоконнике').context['page_obj']
+        self.assertIsInstance(page_obj.paginator.object_list,
+                              search.LikeSearchResults)
+        self.assertEqual(set(page_obj),
+                         {SearchTest.frequent, SearchTest.rare})
@@ -29,6 +29,7 @@ class StaticURLTests(TestCase):
             f'/posts/{cls.post.id}/': 'posts/post_detail.html',
             f'/posts/{cls.post.id}/edit/': 'posts/create_post.html',
             '/create/': 'posts/create_post.html',
+            '/search/': 'posts/search.html',
             'dfsdf': 'core/404.html'
         }
 
@@ -1,13 +1,23 @@
 import shutil
 import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
-from posts.models import Post, Group, Follow
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+from core import page_cache
+from posts import cards, thumbnails
+from posts.models import (Post, Group, Comment, Follow, FeedEntry,
+                          UserCounters)
 
 User = get_user_model()
 
@@ -66,6 +76,7 @@ class PostsViewsTest(TestCase):
 
     @classmethod
     def tearDownClass(cls):
+        super().tearDownClass()
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
@@ -101,13 +112,12 @@ class PostsViewsTest(TestCase):
         response1 = self.authorized_client.get(
             reverse('posts:index')
         )
-        Post.objects.all().delete()
+        Post.objects.update(text='Изменено в обход сигналов')
         response2 = self.authorized_client.get(
             reverse('posts:index')
         )
         self.assertEqual(response1.content,
                          response2.content)
-        cache.clear()
         Post.objects.create(
             author=PostsViewsTest.user,
             text='Тестовый пост'
@@ -118,6 +128,74 @@ class PostsViewsTest(TestCase):
         self.assertNotEqual(response2.content,
                             response3.content)
 
+    def test_cache_purge_by_tags(self):
+        """Изменения поста, группы и подписок сбрасывают только
+        зависящие от них страницы"""
+        group = Group.objects.create(title='Пустая группа', slug='empty')
+        other_url = reverse('posts:group', kwargs={'slug': group.slug})
+        url = reverse('posts:profile',
+                      kwargs={'username': PostsViewsTest.user.username})
+        self.guest_client.get(other_url)
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'Подписчиков: 0')
+        Follow.objects.create(user=PostsViewsTest.user2,
+                              author=PostsViewsTest.user)
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'Подписчиков: 1')
+        response = self.guest_client.get(other_url)
+        self.assertNotIn('page_obj', response.context)
+        PostsViewsTest.group.title = 'Новое название'
+        PostsViewsTest.group.save()
+        response = self.guest_client.get(
+            reverse('posts:group',
+                    kwargs={'slug': PostsViewsTest.group.slug})
+        )
+        self.assertContains(response, 'Новое название')
+        response = self.guest_client.get(reverse('posts:index'))
+        post = response.context['page_obj'][0]
+        post.delete()
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotIn(post, response.context['page_obj'])
+
+    def test_cache_purge_during_render(self):
+        """Сброс тега, пока страница рисуется, не даёт закэшировать
+        её как свежую"""
+        attach = cards.attach
+
+        def attach_and_purge(*args, **kwargs):
+            attach(*args, **kwargs)
+            page_cache.purge('feed:index')
+
+        with mock.patch.object(cards, 'attach', attach_and_purge):
+            self.guest_client.get(reverse('posts:index'))
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertIn('page_obj', response.context)
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotIn('page_obj', response.context)
+
+    def test_post_tags_purge_during_render(self):
+        """Сброс тегов постов после их чтения не даёт закэшировать
+        группу и профиль как свежие"""
+        attach = cards.attach
+        pages = (
+            (reverse('posts:group',
+                     kwargs={'slug': PostsViewsTest.group.slug}),
+             f'author:{PostsViewsTest.user.pk}'),
+            (reverse('posts:profile',
+                     kwargs={'username': PostsViewsTest.user.username}),
+             f'group:{PostsViewsTest.group.pk}'),
+        )
+        for url, tag in pages:
+            def attach_and_purge(*args, **kwargs):
+                attach(*args, **kwargs)
+                page_cache.purge(tag)
+
+            with self.subTest(url=url):
+                with mock.patch.object(cards, 'attach', attach_and_purge):
+                    self.guest_client.get(url)
+                response = self.guest_client.get(url)
+                self.assertIn('page_obj', response.context)
+
     def test_paginator_index(self):
         """В шаблоне index используется paginator"""
         response = self.client.get(reverse('posts:index'))
@@ -125,6 +203,34 @@ class PostsViewsTest(TestCase):
         response = self.client.get(reverse('posts:index') + '?page=2')
         self.assertEqual(len(response.context['page_obj']), 3)
 
+    def test_keyset_paginator_index(self):
+        """Курсоры after/before в index листают ленту без пропусков"""
+        response = self.client.get(reverse('posts:index'))
+        first_page = response.context['page_obj']
+        self.assertIsNone(first_page.previous_cursor)
+        response = self.client.get(
+            reverse('posts:index') + f'?after={first_page.next_cursor}'
+        )
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+        self.assertFalse(
+            set(first_page.object_list) & set(second_page.object_list)
+        )
+        response = self.client.get(
+            reverse('posts:index') + f'?before={second_page.previous_cursor}'
+        )
+        self.assertEqual(list(response.context['page_obj']),
+                         list(first_page))
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_keyset_paginator_bad_cursor(self):
+        """Испорченный курсор открывает первую страницу"""
+        response = self.client.get(reverse('posts:index') + '?after=%%%')
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
     def test_context_group_list(self):
         """Шаблон group_list сформирован с правильным контекстом"""
         response = self.authorized_client.get(
@@ -324,3 +430,320 @@ class PostsViewsTest(TestCase):
         self.assertFalse(
             new_post in response_un_follow.context.get('page_obj').object_list
         )
+
+    def test_feed_entries_follow_unfollow(self):
+        """Подписка наполняет ленту, отписка и удаление поста чистят её"""
+        author = User.objects.create(username='test')
+        old_post = Post.objects.create(author=author, text='Старый пост')
+        Follow.objects.create(user=PostsViewsTest.user2, author=author)
+        feed = FeedEntry.objects.filter(user=PostsViewsTest.user2)
+        self.assertEqual(list(feed.values_list('post', flat=True)),
+                         [old_post.id])
+        new_post = Post.objects.create(author=author, text='Новый пост')
+        self.assertEqual(feed.count(), 2)
+        new_post.delete()
+        self.assertEqual(feed.count(), 1)
+        self.authorized_client2.get(
+            reverse('posts:profile_unfollow',
+                    kwargs={'username': author.username})
+        )
+        self.assertFalse(feed.exists())
+
+    def test_rebuild_feeds_command(self):
+        """Команда rebuild_feeds восстанавливает ленты подписок"""
+        Follow.objects.create(user=PostsViewsTest.user2,
+                              author=PostsViewsTest.user)
+        FeedEntry.objects.all().delete()
+        # Запись в ленте того, кто ни на кого не подписан, лишняя.
+        post = Post.objects.first()
+        FeedEntry.objects.create(user=PostsViewsTest.user, post=post,
+                                 pub_date=post.pub_date)
+        call_command('rebuild_feeds', batch_size=5, stdout=StringIO())
+        self.assertFalse(
+            FeedEntry.objects.filter(user=PostsViewsTest.user).exists()
+        )
+        response = self.authorized_client2.get(
+            reverse('posts:follow_index')
+        )
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=PostsViewsTest.user2).count(),
+            len(PostsViewsTest.post_list)
+        )
+
+    def test_counters(self):
+        """Счётчики постов, подписок и комментариев обновляются сигналами"""
+        author = User.objects.create(username='test')
+        post = Post.objects.create(author=author, text='Пост',
+                                   group=PostsViewsTest.group)
+        Follow.objects.create(user=PostsViewsTest.user2, author=author)
+        Comment.objects.create(post=post, author=PostsViewsTest.user2,
+                               text='Комментарий')
+        author.counters.refresh_from_db()
+        post.refresh_from_db()
+        self.assertEqual(author.counters.posts_count, 1)
+        self.assertEqual(author.counters.followers_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        new_group = Group.objects.create(title='Другая', slug='other')
+        post.group = new_group
+        post.save()
+        new_group.refresh_from_db()
+        self.assertEqual(new_group.posts_count, 1)
+        post.delete()
+        author.counters.refresh_from_db()
+        new_group.refresh_from_db()
+        self.assertEqual(author.counters.posts_count, 0)
+        self.assertEqual(new_group.posts_count, 0)
+
+    def test_counters_follow_user_lifetime(self):
+        """Строка счётчиков появляется вместе с пользователем и не
+        воскресает при каскадном удалении его постов и подписок"""
+        author = User.objects.create(username='short_lived')
+        self.assertTrue(UserCounters.objects.filter(user=author).exists())
+        Post.objects.create(author=author, text='Пост')
+        Follow.objects.create(user=author, author=PostsViewsTest.user)
+        author.delete()
+        self.assertFalse(
+            UserCounters.objects.filter(user_id=author.pk).exists()
+        )
+
+    def test_reconcile_counters_command(self):
+        """Команда reconcile_counters исправляет расхождения счётчиков"""
+        call_command('reconcile_counters', stdout=StringIO())
+        PostsViewsTest.group.refresh_from_db()
+        self.assertEqual(PostsViewsTest.group.posts_count,
+                         len(PostsViewsTest.post_list))
+        response = self.client.get(
+            reverse('posts:profile',
+                    kwargs={'username': PostsViewsTest.user.username})
+        )
+        self.assertEqual(response.context['author'].counters.posts_count,
+                         len(PostsViewsTest.post_list))
+
+    def test_card_cache(self):
+        """Карточки постов берутся из кэша до изменения поста или автора"""
+        posts = Post.objects.select_related('author', 'group')[:10]
+        with self.assertTemplateUsed('includes/card.html'):
+            cards.attach(posts, show_author=True)
+        with self.assertTemplateNotUsed('includes/card.html'):
+            cards.attach(posts, show_author=True)
+        post = posts[0]
+        post.text = 'Изменённый текст'
+        post.save()
+        self.assertIn('Изменённый текст',
+                      cards.attach([post], show_author=True)[0].card_html)
+        PostsViewsTest.user.first_name = 'Новое имя'
+        PostsViewsTest.user.save()
+        posts = cards.attach(
+            Post.objects.select_related('author', 'group')[:10],
+            show_author=True
+        )
+        for post in posts:
+            self.assertIn('Новое имя', post.card_html)
+
+    def test_thumbnail_placeholder(self):
+        """Пока миниатюры не готовы, карточка показывает заглушку,
+        а готовые выводятся с srcset и размерами"""
+        buffer = BytesIO()
+        Image.new('RGB', (1200, 600), 'red').save(buffer, 'JPEG')
+        post = Post.objects.create(
+            author=PostsViewsTest.user, text='Пост с картинкой',
+            image=SimpleUploadedFile('wide.jpg', buffer.getvalue(),
+                                     content_type='image/jpeg')
+        )
+        card_html = cards.attach([post])[0].card_html
+        self.assertNotIn('<img', card_html)
+        self.assertIn('bg-light', card_html)
+        thumbnails.generate_for_post(post.pk, post.image.name)
+        post = thumbnails.prefetch([post])[0]
+        self.assertTrue(all(post.ready_thumbnails.values()))
+        card_html = cards.attach([post])[0].card_html
+        self.assertIn('<img', card_html)
+        self.assertIn('srcset=', card_html)
+        self.assertIn('width="960" height="339"', card_html)
+        # Шире оригинала миниатюры не делаются.
+        for width in settings.POST_IMAGE_WIDTHS:
+            if width <= 1200:
+                self.assertIn(f' {width}w', card_html)
+            else:
+                self.assertNotIn(f' {width}w', card_html)
+
+    def test_thumbnail_of_tiny_image(self):
+        """Картинка уже самого узкого размера получает только его
+        и не растягивается"""
+        post = Post.objects.select_related('author', 'group').first()
+        thumbnails.generate(post.image.name)
+        post = thumbnails.prefetch([post])[0]
+        narrowest = min(settings.POST_IMAGE_WIDTHS)
+        self.assertEqual(
+            {alias: file.width
+             for alias, file in post.ready_thumbnails.items()},
+            {alias: 1 for alias in thumbnails.aliases()
+             if thumbnails.width(alias) == narrowest}
+        )
+
+    def test_thumbnail_name_matches_sorl(self):
+        """Имя миниатюры совпадает с тем, что даёт get_thumbnail"""
+        image = Post.objects.first().image
+        for alias in thumbnails.aliases():
+            geometry, options = settings.POST_THUMBNAILS[alias]
+            with self.subTest(alias=alias):
+                self.assertEqual(
+                    thumbnails.thumbnail_file(image, alias).name,
+                    get_thumbnail(image, geometry, **options).name
+                )
+
+    def test_thumbnails_queued_on_save(self):
+        """Миниатюры ставятся в очередь при сохранении новой картинки,
+        а не при показе поста"""
+        with mock.patch.object(thumbnails, 'enqueue') as enqueue:
+            post = Post.objects.create(author=PostsViewsTest.user,
+                                       text='Пост',
+                                       image=PostsViewsTest.uploaded)
+            enqueue.assert_called_once_with(post)
+            post.text = 'Другой текст'
+            post.save()
+            cards.attach([post])
+            self.client.get(reverse('posts:post_detail',
+                                    kwargs={'post_id': post.pk}))
+            enqueue.assert_called_once_with(post)
+
+    def test_thumbnail_prefetch(self):
+        """Миниатюры всех карточек страницы ищутся одним запросом"""
+        posts = list(Post.objects.select_related('author', 'group')[:10])
+        with CaptureQueriesContext(connection) as queries:
+            cards.attach(posts)
+        kvstore_queries = [query for query in queries.captured_queries
+                           if 'thumbnail_kvstore' in query['sql']]
+        self.assertEqual(len(kvstore_queries), 1)
+        for post in posts:
+            self.assertEqual(
+                post.ready_thumbnails,
+                dict.fromkeys(thumbnails.aliases())
+            )
+
+    def test_shared_page_cache(self):
+        """Гость и пользователь получают одну закэшированную ленту,
+        но каждый со своей шапкой"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group',
+                    kwargs={'slug': PostsViewsTest.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': PostsViewsTest.user.username}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIn('page_obj', response.context)
+                self.assertContains(response, 'Войти')
+                response = self.authorized_client2.get(url)
+                self.assertTemplateNotUsed(response, 'includes/card.html')
+                self.assertNotIn('page_obj', response.context)
+                self.assertContains(response, 'Пользователь: alex')
+                self.assertNotContains(response, 'Войти')
+
+    def test_shared_page_cache_follow_button(self):
+        """Кнопка подписки в закэшированном профиле своя у каждого"""
+        url = reverse('posts:profile',
+                      kwargs={'username': PostsViewsTest.user.username})
+        Follow.objects.create(user=PostsViewsTest.user2,
+                              author=PostsViewsTest.user)
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'Подписаться')
+        response = self.authorized_client2.get(url)
+        self.assertContains(response, 'Отписаться')
+        response = self.authorized_client.get(url)
+        self.assertNotContains(response, 'Подписаться')
+        self.assertNotContains(response, 'Отписаться')
+
+    def test_conditional_get(self):
+        """Неизменившаяся страница отдаётся как 304 без отрисовки,
+        а после изменений или другому пользователю - целиком"""
+        post = Post.objects.create(author=PostsViewsTest.user, text='Пост',
+                                   group=PostsViewsTest.group)
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group',
+                    kwargs={'slug': PostsViewsTest.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': PostsViewsTest.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': post.id}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                etag = response['ETag']
+                self.assertIn('Last-Modified', response)
+                self.assertIn('private', response['Cache-Control'])
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                self.assertEqual(response.templates, [])
+                response = self.authorized_client2.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+                Comment.objects.create(post=post,
+                                       author=PostsViewsTest.user2,
+                                       text='Комментарий')
+                post.text = f'Пост для {url}'
+                post.save()
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, f'Пост для {url}')
+
+    def test_post_detail_comments_query_budget(self):
+        """Число запросов post_detail, post_edit и add_comment не растёт
+        с числом комментариев"""
+        post = Post.objects.create(author=PostsViewsTest.user, text='Пост')
+        urls = (
+            reverse('posts:post_detail', kwargs={'post_id': post.id}),
+            reverse('posts:post_edit', kwargs={'post_id': post.id}),
+        )
+        budgets = {}
+        for total in (1, 30):
+            commenters = [
+                User.objects.create_user(username=f'commenter_{total}_{i}')
+                for i in range(total)
+            ]
+            Comment.objects.bulk_create(
+                Comment(post=post, author=author, text='Комментарий')
+                for author in commenters
+            )
+            for url in urls:
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    self.authorized_client.get(url)
+                budgets.setdefault(url, []).append(len(queries))
+            with CaptureQueriesContext(connection) as queries:
+                self.authorized_client.post(
+                    reverse('posts:add_comment', kwargs={'post_id': post.id}),
+                    data={'text': 'Ещё комментарий'}
+                )
+            budgets.setdefault('add_comment', []).append(len(queries))
+        for url, (small, large) in budgets.items():
+            with self.subTest(url=url):
+                self.assertEqual(small, large)
+
+    def test_post_detail_comments_pagination(self):
+        """Комментарии к посту выводятся постранично по курсору"""
+        post = Post.objects.create(author=PostsViewsTest.user, text='Пост')
+        for i in range(settings.QUANTITY_COMMENT + 5):
+            Comment.objects.create(post=post, author=PostsViewsTest.user2,
+                                   text=f'Комментарий {i}')
+        url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        response = self.guest_client.get(url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), settings.QUANTITY_COMMENT)
+        self.assertContains(
+            response, f'Комментариев:  <span >{settings.QUANTITY_COMMENT + 5}'
+        )
+        response = self.guest_client.get(
+            f'{url}?after={comments.next_cursor}'
+        )
+        self.assertEqual(len(response.context['comments']), 5)
@@ -0,0 +1,221 @@
+"""Миниатюры картинок постов, которые готовятся вне запроса.
+
+Размеры и форматы перечислены в settings.POST_THUMBNAILS. Пост с новой
+картинкой ставится в очередь пула потоков сигналом post_save, а шаблон
+только берёт готовые миниатюры через prefetch(), сразу для целой
+страницы, и пока их нет, показывает заглушку. Когда миниатюры готовы,
+карточка и страницы с постом сбрасываются, и следующий показ уже с
+картинкой. Посты, записанные в обход сигналов (импорт, seed_yatube),
+догоняет команда warm_thumbnails.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connection, transaction
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDbKVStore
+)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pending = set()
+_executor = None
+_executor_pid = None
+
+
+def thumbnail_file(image, alias):
+    """ImageFile миниатюры с тем же именем, что дал бы get_thumbnail.
+
+    Сам get_thumbnail при промахе создал бы миниатюру прямо в запросе,
+    поэтому имя считается так же, как в нём, через закрытый
+    _get_thumbnail_filename. Он есть не во всех версиях sorl-thumbnail,
+    поэтому версия закреплена в requirements.txt; при обновлении её
+    проверяет test_thumbnail_name_matches_sorl.
+    """
+    geometry, options = settings.POST_THUMBNAILS[alias]
+    backend = default.backend
+    options = dict(options)
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(ImageFile(image), geometry,
+                                           options)
+    return ImageFile(name, default.storage)
+
+
+def image_format(alias):
+    return settings.POST_THUMBNAILS[alias][1].get('format', 'JPEG')
+
+
+def width(alias):
+    return int(settings.POST_THUMBNAILS[alias][0].split('x')[0])
+
+
+def aliases(source_width=None):
+    """Размеры из POST_THUMBNAILS в форматах, которые умеет писать Pillow.
+
+    Если ширина оригинала известна, размеры шире него пропускаются: без
+    upscale они повторили бы меньший. Самый узкий размер каждого формата
+    остаётся всегда.
+    """
+    Image.init()
+    result = [alias for alias in settings.POST_THUMBNAILS
+              if image_format(alias) in Image.SAVE]
+    if source_width is None:
+        return result
+    narrowest = {}
+    for alias in sorted(result, key=width, reverse=True):
+        narrowest[image_format(alias)] = alias
+    return [alias for alias in result
+            if width(alias) <= source_width
+            or alias in narrowest.values()]
+
+
+def warm(image_name, alias):
+    """Создаёт одну миниатюру, если её ещё нет."""
+    geometry, options = settings.POST_THUMBNAILS[alias]
+    get_thumbnail(image_name, geometry, **options)
+
+
+def _get_many(files):
+    """Как kvstore.get для каждого файла, но одним походом в кэш и БД."""
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDbKVStore):
+        return {file.key: kvstore.get(file) for file in files}
+    keys = {add_prefix(file.key): file.key for file in files}
+    values = kvstore.cache.get_many(keys)
+    missing = keys.keys() - values.keys()
+    if missing:
+        stored = dict(KVStoreModel.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        # Ненайденные ключи тоже запоминаем, как это делает сам sorl.
+        kvstore.cache.set_many(
+            {key: stored.get(key, EMPTY_VALUE) for key in missing},
+            sorl_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        values.update(stored)
+    return {
+        keys[key]: deserialize_image_file(value)
+        for key, value in values.items() if value != EMPTY_VALUE
+    }
+
+
+def prefetch(posts):
+    """Находит готовые миниатюры всех постов страницы одним запросом.
+
+    Результат кладётся в post.ready_thumbnails: {размер: ImageFile}.
+    Вместе с миниатюрами читается и запись об оригинале: по его ширине
+    отбрасываются размеры, которых для этой картинки не делают.
+    """
+    sources = {}
+    wanted = []
+    for post in posts:
+        post.ready_thumbnails = {}
+        if post.image:
+            sources[post] = ImageFile(post.image)
+            wanted.extend(
+                (post, alias, thumbnail_file(post.image, alias))
+                for alias in aliases()
+            )
+    found = _get_many([*sources.values(),
+                       *(file for _, _, file in wanted)])
+    expected = {}
+    for post, source in sources.items():
+        source = found.get(source.key)
+        expected[post] = set(aliases(source and source.width))
+    for post, alias, file in wanted:
+        if alias in expected[post]:
+            post.ready_thumbnails[alias] = found.get(file.key)
+    return posts
+
+
+def generate(image_name):
+    """Создаёт миниатюры всех размеров, которые не шире картинки.
+
+    Оригинал записывается в хранилище sorl, чтобы prefetch() знал его
+    ширину, даже если ни одной миниатюры делать не пришлось.
+    """
+    source = default.kvstore.get_or_set(ImageFile(image_name))
+    for alias in aliases(source.width):
+        warm(image_name, alias)
+
+
+def generate_for_post(post_id, image_name):
+    from posts.models import Post
+    from posts.signals import purge_post_caches
+
+    generate(image_name)
+    post = Post.objects.filter(pk=post_id).only(
+        'pk', 'author_id', 'group_id'
+    ).first()
+    if post is not None:
+        purge_post_caches(post)
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    # Пул, унаследованный через fork, без своих потоков не работает.
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails'
+        )
+        _executor_pid = os.getpid()
+    return _executor
+
+
+def _run(post_id, image_name):
+    try:
+        generate_for_post(post_id, image_name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', image_name)
+    finally:
+        with _lock:
+            _pending.discard(image_name)
+
+
+def _run_in_thread(post_id, image_name):
+    try:
+        _run(post_id, image_name)
+    finally:
+        # У каждого потока пула своё соединение с базой.
+        connection.close()
+
+
+def _submit(post_id, image_name):
+    with _lock:
+        if image_name in _pending:
+            return
+        _pending.add(image_name)
+    if settings.THUMBNAIL_WORKERS:
+        _get_executor().submit(_run_in_thread, post_id, image_name)
+    else:
+        _run(post_id, image_name)
+
+
+def enqueue(post):
+    """Ставит миниатюры поста в очередь после фиксации транзакции."""
+    image = post.image
+    try:
+        if not image or not image.storage.exists(image.name):
+            return
+    except SuspiciousFileOperation:
+        # Путь вне MEDIA_ROOT: такой файл sorl всё равно не откроет.
+        return
+    transaction.on_commit(lambda: _submit(post.pk, image.name))
@@ -1,5 +1,5 @@
 from django.urls import path
-from posts import views
+from posts import api, views
 
 app_name = 'posts'
 urlpatterns = [
@@ -31,6 +31,8 @@ urlpatterns = [
     ),
     path('create/', views.post_create, name='post_create'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
+    path('export/', views.export, name='export'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -45,5 +47,18 @@ urlpatterns = [
         'posts/<int:post_id>/delete/',
         views.post_delete,
         name='post_delete'
+    ),
+    path('api/posts/', api.index, name='api_index'),
+    path('api/group/<slug:slug>/', api.group_posts, name='api_group'),
+    path(
+        'api/profile/<str:username>/',
+        api.profile,
+        name='api_profile'
+    ),
+    path('api/follow/', api.follow_index, name='api_follow_index'),
+    path(
+        'api/posts/<int:post_id>/',
+        api.post_detail,
+        name='api_post_detail'
     )
 ]
@@ -1,72 +1,219 @@
+from datetime import datetime, timezone
+
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import redirect, render, get_object_or_404
-from django.views.decorators.cache import cache_page
-from django.views.decorators.vary import vary_on_cookie
+from django.views.decorators.http import condition
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
 from django.core.paginator import Paginator
-from posts.models import Post, Group, Comment, Follow
+from core import page_cache
+from core.page_cache import add_tags, shared_cache_page
+from core.paginator import KeysetPaginator
+from posts import cards, exporter, thumbnails
+from posts.models import Post, Group, Comment, Follow, FeedEntry
 from posts.forms import PostForm, CommentForm
-from yatube.settings import QUANTITY_POST
+from posts.search import search as search_posts
+from yatube.settings import (PAGE_CACHE_TIMEOUT, QUANTITY_COMMENT,
+                             QUANTITY_POST)
 
 User = get_user_model()
 
 
-def paginator(post_list, request):
-    paginator = Paginator(post_list, QUANTITY_POST)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+def paginator(post_list, request, count=None, per_page=QUANTITY_POST,
+              date_field='pub_date'):
+    paginator = KeysetPaginator(post_list, per_page,
+                                date_field=date_field, count=count)
+    page_obj = paginator.get_page(
+        request.GET.get('page'),
+        after=request.GET.get('after'),
+        before=request.GET.get('before')
+    )
+    return page_obj
+
+
+def page_group(request, slug):
+    if getattr(request, 'page_group', None) is None:
+        # Версия тега снимается по ключу, до чтения группы и счётчика.
+        pk = get_object_or_404(
+            Group.objects.values_list('pk', flat=True), slug=slug
+        )
+        add_tags(request, f'group:{pk}')
+        request.page_group = get_object_or_404(Group, pk=pk)
+    return request.page_group
+
+
+def page_author(request, username):
+    if getattr(request, 'page_author', None) is None:
+        request.page_author = get_object_or_404(
+            User.objects.select_related('counters'),
+            username=username
+        )
+    return request.page_author
+
+
+def add_post_tags(request, posts):
+    tags = set()
+    for post in posts:
+        tags.add(f'author:{post.author_id}')
+        if post.group_id is not None:
+            tags.add(f'group:{post.group_id}')
+    add_tags(request, *tags)
+
+
+def post_page(request, post_list, count=None):
+    """Страница постов, теги которой сняты до чтения самих постов.
+
+    Сперва страница выбирается по ключам, авторам и группам, затем
+    посты читаются целиком.
+    """
+    page_obj = paginator(
+        post_list.select_related(None).only(
+            'pk', 'author_id', 'group_id', 'pub_date'
+        ),
+        request, count
+    )
+    add_post_tags(request, page_obj)
+    posts = post_list.in_bulk([post.pk for post in page_obj])
+    page_obj.object_list = [
+        posts[post.pk] for post in page_obj if post.pk in posts
+    ]
     return page_obj
 
 
-@cache_page(timeout=20, key_prefix='index_page')
-@vary_on_cookie
+def follow_button_context(request, username):
+    author = page_author(request, username)
+    following = (request.user.is_authenticated and Follow.objects.filter(
+        user=request.user,
+        author=author
+    ).exists())
+    return {
+        'author': author,
+        'following': following
+    }
+
+
+@shared_cache_page(timeout=PAGE_CACHE_TIMEOUT, key_prefix='index_page')
 def index(request):
+    add_tags(request, 'feed:index')
     post_list = Post.objects.select_related('author',
                                             'group')
+    page_obj = post_page(request, post_list)
+    cards.attach(page_obj, show_author=True, show_group=True)
     context = {
-        'page_obj': paginator(post_list, request)
+        'page_obj': page_obj
     }
 
     return render(request, 'posts/index.html', context)
 
 
+@shared_cache_page(timeout=PAGE_CACHE_TIMEOUT, key_prefix='group_page')
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    group = page_group(request, slug)
+    post_list = group.posts.select_related('author', 'group')
+    page_obj = post_page(request, post_list, group.posts_count)
+    cards.attach(page_obj, show_author=True)
     context = {
         'group': group,
-        'page_obj': paginator(post_list, request)
+        'page_obj': page_obj
     }
 
     return render(request, 'posts/group_list.html', context)
 
 
+@shared_cache_page(timeout=PAGE_CACHE_TIMEOUT, key_prefix='profile_page',
+                   fragment_context=follow_button_context)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    following = (request.user.is_authenticated and Follow.objects.filter(
-        user=request.user,
-        author=User.objects.get(username=username)
-    ).exists())
-
-    post_list = author.posts.all()
+    # Версия тега снимается по ключу, до чтения автора и счётчиков.
+    add_tags(request, 'author:{}'.format(get_object_or_404(
+        User.objects.values_list('pk', flat=True), username=username
+    )))
+    author = page_author(request, username)
+    post_list = author.posts.select_related('author', 'group')
+    counters = getattr(author, 'counters', None)
+    page_obj = post_page(request, post_list,
+                         counters and counters.posts_count)
+    cards.attach(page_obj, show_group=True)
     context = {
         'author': author,
-        'page_obj': paginator(post_list, request),
-        'following': following
+        'page_obj': page_obj,
+        **follow_button_context(request, username)
     }
     return render(request, 'posts/profile.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = Paginator(
+        search_posts(query), QUANTITY_POST
+    ).get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def post_validators(request, post_id):
+    """ETag и Last-Modified поста без чтения текста и комментариев."""
+    if getattr(request, 'post_validators', None) is None:
+        request.post_validators = (None, None)
+        row = Post.objects.filter(pk=post_id).values_list(
+            'author_id', 'group_id', 'comments_count'
+        ).first()
+        if row is not None:
+            author_id, group_id, comments_count = row
+            # Правка поста, его картинки и счётчиков автора сбрасывает
+            # тег автора, новый комментарий меняет последний комментарий.
+            versions = page_cache.tag_versions(f'author:{author_id}',
+                                               f'group:{group_id}')
+            last_comment = Comment.objects.filter(post_id=post_id).order_by(
+                '-created', '-id'
+            ).values_list('created', 'id').first()
+            etag, last_modified = page_cache.validators(
+                versions, comments_count, last_comment,
+                request.GET.urlencode(),
+                page_cache.viewer_key(request, csrf=True)
+            )
+            if last_comment is not None:
+                last_modified = max(last_modified or 0,
+                                    last_comment[0].timestamp())
+            request.post_validators = (etag, last_modified)
+    return request.post_validators
+
+
+def post_etag(request, post_id):
+    return post_validators(request, post_id)[0]
+
+
+def post_last_modified(request, post_id):
+    last_modified = post_validators(request, post_id)[1]
+    if last_modified is not None:
+        return datetime.fromtimestamp(last_modified, timezone.utc)
+
+
+@condition(etag_func=post_etag, last_modified_func=post_last_modified)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'),
+        id=post_id
+    )
+    thumbnails.prefetch([post])
     form = CommentForm(request.POST or None)
-    comments = Comment.objects.filter(post=post)
+    comments = paginator(
+        post.comments.select_related('author'),
+        request,
+        post.comments_count,
+        per_page=QUANTITY_COMMENT,
+        date_field='created'
+    )
     context = {
         'post': post,
         'form': form,
         'comments': comments
     }
-    return render(request, 'posts/post_detail.html', context)
+    response = render(request, 'posts/post_detail.html', context)
+    return page_cache.set_validators(response,
+                                     *post_validators(request, post_id))
 
 
 @login_required
@@ -89,7 +236,7 @@ def post_create(request):
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
 
-    if request.user != post.author:
+    if request.user.pk != post.author_id:
         return redirect('posts:post_detail', post_id=post_id)
 
     form = PostForm(request.POST or None,
@@ -110,7 +257,7 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.only('pk'), id=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         form.instance.author = request.user
@@ -121,12 +268,15 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.select_related(
-        'author',
-        'group',
-    ).filter(author__following__user=request.user)
+    feed = FeedEntry.objects.select_related(
+        'post__author',
+        'post__group',
+    ).filter(user=request.user)
+    page_obj = paginator(feed, request)
+    page_obj.object_list = [entry.post for entry in page_obj]
+    cards.attach(page_obj, show_author=True, show_group=True)
     context = {
-        'page_obj': paginator(post_list, request)
+        'page_obj': page_obj
     }
 
     return render(request, 'posts/follow.html', context)
@@ -158,3 +308,18 @@ def post_delete(request, post_id):
         id=post_id
     ).delete()
     return render(request, 'posts/post_deleted.html')
+
+
+@login_required
+def export(request):
+    file_format = request.GET.get('format', 'jsonl')
+    if file_format not in exporter.CONTENT_TYPES:
+        raise Http404
+    response = StreamingHttpResponse(
+        exporter.stream(request.user, file_format),
+        content_type=exporter.CONTENT_TYPES[file_format]
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{request.user.username}.{file_format}"'
+    )
+    return response
@@ -0,0 +1,9 @@
+from core.query_budget import Budget
+
+BUDGETS = {
+    'users:logout': Budget(4),
+    'users:login': Budget(0, login=None),
+    'users:signup': Budget(0, login=None),
+    'users:password_change': Budget(2),
+    'users:password_change_done': Budget(2),
+}
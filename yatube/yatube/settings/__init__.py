@@ -0,0 +1,16 @@
+"""Профиль настроек выбирает переменная окружения YATUBE_ENV:
+development (по умолчанию), test или production."""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+_env = os.environ.get('YATUBE_ENV', 'development')
+
+if _env == 'production':
+    from yatube.settings.production import *  # noqa: F401,F403
+elif _env == 'test':
+    from yatube.settings.test import *  # noqa: F401,F403
+elif _env == 'development':
+    from yatube.settings.base import *  # noqa: F401,F403
+else:
+    raise ImproperlyConfigured(f'Неизвестный YATUBE_ENV: {_env}')
@@ -1,6 +1,11 @@
+"""Общие настройки; сами по себе это профиль для разработки."""
 import os
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)
+)))
+
+YATUBE_ENV = 'development'
 
 SECRET_KEY = 'w8ie5i%wi&g)c3agz66l8)1wv3+%wcd)8qb4#k+)y+3q$)+c17'
 
@@ -30,11 +35,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.profiling.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -67,6 +74,16 @@ DATABASES = {
     }
 }
 
+# PRAGMA для каждого соединения с SQLite, см. core.sqlite.
+SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'memory',
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -88,6 +105,15 @@ CACHES = {
     }
 }
 
+# Куда воркеры сбрасывают снимки метрик, чтобы /metrics их сложил;
+# None - каждый процесс показывает только свои.
+METRICS_DIR = None
+
+METRICS_FLUSH_INTERVAL: int = 10
+
+# Токен для Authorization: Bearer; без него /metrics только персоналу.
+METRICS_TOKEN = ''
+
 LANGUAGE_CODE = 'ru-RU'
 
 TIME_ZONE = 'UTC'
@@ -107,6 +133,32 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 QUANTITY_POST: int = 10
 
+QUANTITY_COMMENT: int = 20
+
+CARD_CACHE_TIMEOUT: int = 60 * 60 * 24
+
+PAGE_CACHE_TIMEOUT: int = 60 * 60 * 24
+
+# Варианты картинки поста для srcset: ширины и форматы, последний из
+# форматов идёт в <img> для браузеров без <picture>.
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+POST_IMAGE_SIZES = '(min-width: 992px) 720px, 100vw'
+
+# Размеры миниатюр постов: имя -> (геометрия, параметры sorl-thumbnail).
+# Картинку не растягиваем: размеры шире оригинала не делаются вовсе.
+POST_THUMBNAILS = {
+    f'{image_format.lower()}-{width}': (
+        f'{width}x{width * 339 // 960}',
+        {'crop': 'center', 'upscale': False, 'format': image_format},
+    )
+    for image_format in POST_IMAGE_FORMATS
+    for width in POST_IMAGE_WIDTHS
+}
+
+# Потоков на процесс для фоновых миниатюр, 0 - делать сразу в запросе.
+THUMBNAIL_WORKERS: int = 2
+
 LOGIN_URL = 'users:login'
 
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -115,3 +167,18 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Загрузки всегда пишутся на диск кусками, а не собираются в памяти.
+FILE_UPLOAD_HANDLERS = ['core.uploads.BoundedUploadHandler']
+
+UPLOAD_MAX_BYTES: int = 20 * 1024 * 1024
+
+# Больше IMAGE_MAX_PIXELS картинку не принимаем, а оригиналы шире
+# IMAGE_MAX_SIDE уменьшаем при загрузке. JPEG уменьшается ещё при
+# декодировании, остальные форматы разворачиваются в память целиком,
+# поэтому для них предел ниже: IMAGE_MAX_DECODED_PIXELS.
+IMAGE_MAX_PIXELS: int = 40_000_000
+
+IMAGE_MAX_DECODED_PIXELS: int = 16_000_000
+
+IMAGE_MAX_SIDE: int = 2560
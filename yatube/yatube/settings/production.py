@@ -0,0 +1,90 @@
+"""Профиль для продакшена: значения берутся из переменных окружения.
+
+Обязательны YATUBE_SECRET_KEY и YATUBE_ALLOWED_HOSTS (через запятую).
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from yatube.settings.base import *  # noqa: F401,F403
+from yatube.settings.base import BASE_DIR, DATABASES, TEMPLATES
+
+
+def env(name, default=None):
+    value = os.environ.get(name, default)
+    if value is None:
+        raise ImproperlyConfigured(f'Не задана переменная окружения {name}')
+    return value
+
+
+YATUBE_ENV = 'production'
+
+DEBUG = False
+
+SECRET_KEY = env('YATUBE_SECRET_KEY')
+
+ALLOWED_HOSTS = [host.strip() for host
+                 in env('YATUBE_ALLOWED_HOSTS').split(',') if host.strip()]
+
+# Шаблоны компилируются один раз на процесс, а не на каждый ответ;
+# контекстный процессор debug не нужен.
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'context_processors': [
+            processor for processor
+            in TEMPLATES[0]['OPTIONS']['context_processors']
+            if processor != 'django.template.context_processors.debug'
+        ],
+        'loaders': [(
+            'django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ],
+        )],
+    },
+}]
+
+# Соединение с базой живёт между запросами, а не открывается на каждый.
+DATABASES = {
+    'default': {
+        **DATABASES['default'],
+        'NAME': env('YATUBE_DB_PATH', DATABASES['default']['NAME']),
+        'CONN_MAX_AGE': int(env('YATUBE_CONN_MAX_AGE', '600')),
+    }
+}
+
+# Один тёплый кэш на все воркеры машины.
+CACHES = {
+    'default': {
+        'BACKEND': 'core.shm_cache.SharedMemoryCache',
+        'LOCATION': env('YATUBE_CACHE_PATH', '/dev/shm/yatube-cache'),
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {
+            'MAX_BYTES': int(env('YATUBE_CACHE_BYTES',
+                                 str(256 * 1024 * 1024))),
+            'MAX_ENTRIES': 100_000,
+        },
+    }
+}
+
+# Сессия читается из кэша, база - только при промахе.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+STATIC_ROOT = env('YATUBE_STATIC_ROOT', os.path.join(BASE_DIR,
+                                                     'staticfiles'))
+STATICFILES_STORAGE = (
+    'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
+)
+
+MEDIA_ROOT = env('YATUBE_MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
+
+METRICS_DIR = env('YATUBE_METRICS_DIR', '/dev/shm/yatube-metrics')
+
+METRICS_TOKEN = env('YATUBE_METRICS_TOKEN', '')
+
+SESSION_COOKIE_SECURE = CSRF_COOKIE_SECURE = (
+    env('YATUBE_HTTPS', '1') == '1'
+)
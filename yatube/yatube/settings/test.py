@@ -0,0 +1,8 @@
+"""Профиль для тестов: всё, что в жизни уходит в фон, делается сразу."""
+from yatube.settings.base import *  # noqa: F401,F403
+
+YATUBE_ENV = 'test'
+
+# Миниатюры создаются в самом запросе: в тестовой базе SQLite в памяти
+# поток пула получил бы "table is locked".
+THUMBNAIL_WORKERS = 0